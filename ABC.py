@@ -1,69 +1,798 @@
+import json
 import numpy as np
-import matplotlib.pyplot as plt
+import os
 import random
-from matplotlib.animation import FuncAnimation
+import tempfile
 import time
+import weakref
+
+class SpatialGrid:
+    """Índice espacial de celdas uniformes para puntos fijos (flores, estaciones de carga)"""
+    def __init__(self, points, cell_size, width, height):
+        self.points = np.asarray(points, dtype=float).reshape(-1, 2)
+        self.cell_size = cell_size
+        self.n_cols = int(np.ceil(width / cell_size)) + 1
+        self.n_rows = int(np.ceil(height / cell_size)) + 1
+        
+        # Puntos ordenados por celda: los de la celda c están en order[cell_start[c]:cell_start[c+1]]
+        cols, rows = self.cell_of(self.points[:, 0], self.points[:, 1])
+        keys = cols * self.n_rows + rows
+        self.order = np.argsort(keys, kind='stable')
+        self.cell_start = np.searchsorted(keys[self.order], np.arange(self.n_cols * self.n_rows + 1))
+    
+    def cell_of(self, x, y):
+        """Celda (columna, fila) de una o varias posiciones"""
+        col = np.clip(np.floor_divide(x, self.cell_size).astype(int), 0, self.n_cols - 1)
+        row = np.clip(np.floor_divide(y, self.cell_size).astype(int), 0, self.n_rows - 1)
+        return col, row
+    
+    def candidates(self, x, y, reach):
+        """Índices de los puntos en las celdas a `reach` celdas o menos de (x, y)"""
+        col, row = self.cell_of(x, y)
+        parts = []
+        for c in range(max(0, col - reach), min(self.n_cols, col + reach + 1)):
+            first = c * self.n_rows + max(0, row - reach)
+            last = c * self.n_rows + min(self.n_rows - 1, row + reach)
+            parts.append(self.order[self.cell_start[first]:self.cell_start[last + 1]])
+        return np.concatenate(parts) if parts else np.empty(0, dtype=int)
+    
+    def query_radius(self, x, y, radius):
+        """Índices (ordenados) de los puntos a distancia menor que radius de (x, y)"""
+        ids = self.candidates(x, y, int(np.ceil(radius / self.cell_size)))
+        distance = np.hypot(self.points[ids, 0] - x, self.points[ids, 1] - y)
+        return np.sort(ids[distance < radius])
+    
+    def query_radius_many(self, xs, ys, radius):
+        """Pares (consulta, punto) a distancia menor que radius para muchas consultas a la vez"""
+        reach = int(np.ceil(radius / self.cell_size))
+        cols, rows = self.cell_of(np.asarray(xs), np.asarray(ys))
+        owners, ids = [], []
+        for dc in range(-reach, reach + 1):
+            c = cols + dc
+            valid_col = (c >= 0) & (c < self.n_cols)
+            # Rango contiguo de filas de la columna c (una sola búsqueda por columna)
+            first = np.clip(c, 0, self.n_cols - 1) * self.n_rows + np.maximum(0, rows - reach)
+            last = np.clip(c, 0, self.n_cols - 1) * self.n_rows + np.minimum(self.n_rows - 1, rows + reach)
+            start = self.cell_start[first]
+            counts = np.where(valid_col, self.cell_start[last + 1] - start, 0)
+            total = counts.sum()
+            if total == 0:
+                continue
+            owner = np.repeat(np.arange(len(cols)), counts)
+            within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            owners.append(owner)
+            ids.append(self.order[start[owner] + within])
+        if not owners:
+            return np.empty(0, dtype=int), np.empty(0, dtype=int)
+        owners = np.concatenate(owners)
+        ids = np.concatenate(ids)
+        distance = np.hypot(self.points[ids, 0] - np.asarray(xs)[owners],
+                            self.points[ids, 1] - np.asarray(ys)[owners])
+        close = distance < radius
+        return owners[close], ids[close]
+
+class NearestPointLookup:
+    """Tabla precalculada de vecino más cercano sobre una rejilla de celdas
+    
+    Para cada celda se guardan solo los puntos que pueden ser el más cercano a
+    alguna posición dentro de ella, así cada consulta compara unos pocos puntos.
+    """
+    def __init__(self, points, cell_size, width, height):
+        self.points = np.asarray(points, dtype=float).reshape(-1, 2)
+        self.cell_size = cell_size
+        self.n_cols = int(np.ceil(width / cell_size)) + 1
+        self.n_rows = int(np.ceil(height / cell_size)) + 1
+        
+        # Centros de las celdas (celda = col * n_rows + fila) y medio diagonal de una celda
+        cols, rows = np.divmod(np.arange(self.n_cols * self.n_rows), self.n_rows)
+        centers_x = (cols + 0.5) * cell_size
+        centers_y = (rows + 0.5) * cell_size
+        half_diagonal = cell_size * np.sqrt(2) / 2
+        
+        # Índice auxiliar con un punto por celda, aproximadamente
+        index_cell = max(cell_size, np.sqrt(width * height / max(len(self.points), 1)))
+        index = SpatialGrid(self.points, index_cell, width, height)
+        
+        # Distancia del centro de cada celda a su punto más cercano, con radios crecientes
+        nearest = np.full(len(cols), np.inf)
+        pending = np.arange(len(cols))
+        radius = index_cell
+        while pending.size:
+            owners, ids = index.query_radius_many(centers_x[pending], centers_y[pending], radius)
+            distance = np.hypot(self.points[ids, 0] - centers_x[pending[owners]],
+                                self.points[ids, 1] - centers_y[pending[owners]])
+            np.minimum.at(nearest, pending[owners], distance)
+            pending = pending[~np.isfinite(nearest[pending])]
+            radius *= 2
+        
+        # Un punto solo puede ser el más cercano dentro de la celda si está a menos de
+        # nearest + 2 * half_diagonal del centro; se consulta por grupos de radio similar
+        reach = nearest + 2 * half_diagonal
+        levels = np.ceil(np.log2(reach / index_cell)).astype(int)
+        cells, ids = [], []
+        for level in np.unique(levels):
+            group = np.flatnonzero(levels == level)
+            owners, found = index.query_radius_many(centers_x[group], centers_y[group],
+                                                    index_cell * 2.0 ** level + 1e-9)
+            distance = np.hypot(self.points[found, 0] - centers_x[group[owners]],
+                                self.points[found, 1] - centers_y[group[owners]])
+            close = distance <= reach[group[owners]] + 1e-9
+            cells.append(group[owners[close]])
+            ids.append(found[close])
+        cells = np.concatenate(cells)
+        ids = np.concatenate(ids)
+        
+        # Filtro exacto: distancia mínima a la celda <= menor distancia máxima de la celda
+        x_low, y_low = cols[cells] * cell_size, rows[cells] * cell_size
+        px, py = self.points[ids, 0], self.points[ids, 1]
+        d_min = np.hypot(np.maximum(0, np.maximum(x_low - px, px - x_low - cell_size)),
+                         np.maximum(0, np.maximum(y_low - py, py - y_low - cell_size)))
+        d_max = np.hypot(np.maximum(np.abs(px - x_low), np.abs(px - x_low - cell_size)),
+                         np.maximum(np.abs(py - y_low), np.abs(py - y_low - cell_size)))
+        best_max = np.full(len(cols), np.inf)
+        np.minimum.at(best_max, cells, d_max)
+        keep = d_min <= best_max[cells] + 1e-9
+        cells, ids = cells[keep], ids[keep]
+        
+        # Candidatos por celda en orden de índice, rellenados con -1
+        order = np.lexsort((ids, cells))
+        cells, ids = cells[order], ids[order]
+        counts = np.bincount(cells, minlength=len(cols))
+        self.candidates = np.full((len(cols), max(counts.max(initial=0), 1)), -1, dtype=int)
+        slots = np.arange(len(ids)) - np.repeat(np.cumsum(counts) - counts, counts)
+        self.candidates[cells, slots] = ids
+    
+    def query(self, xs, ys):
+        """Índices del punto más cercano para varias posiciones"""
+        xs, ys = np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)
+        col = np.clip(np.floor_divide(xs, self.cell_size).astype(int), 0, self.n_cols - 1)
+        row = np.clip(np.floor_divide(ys, self.cell_size).astype(int), 0, self.n_rows - 1)
+        ids = self.candidates[col * self.n_rows + row]
+        points = self.points[np.maximum(ids, 0)]
+        distance = np.hypot(points[..., 0] - xs[..., None], points[..., 1] - ys[..., None])
+        distance[ids < 0] = np.inf
+        return np.take_along_axis(ids, np.argmin(distance, axis=-1)[..., None], axis=-1)[..., 0]
+    
+    def nearest(self, x, y):
+        """Índice del punto más cercano a (x, y)"""
+        return int(self.query(x, y))
+
+FLOWER_KEYS = ('position', 'maturity', 'pollination_level', 'visits', 'id')
+# Campo de una flor -> arreglo del invernadero que lo guarda
+FLOWER_ARRAYS = {'maturity': 'flower_maturity', 'pollination_level': 'flower_pollination',
+                 'visits': 'flower_visits'}
+
+# Códigos numéricos de estados y tipos de drone (para el estado en arreglos)
+DRONE_STATES = ('exploring', 'pollinating', 'returning', 'charging', 'waiting')
+EXPLORING, POLLINATING, RETURNING, CHARGING, WAITING = range(len(DRONE_STATES))
+DRONE_TYPES = ('worker', 'observer', 'scout')
+
+def abc_flower_weights(drone_type, maturity, visits, pollination, base_weight, exploration_bonus):
+    """Pesos ABC de un conjunto de flores candidatas para un tipo de drone"""
+    if drone_type == 'worker':
+        # Abejas obreras: seleccionan basado en calidad conocida
+        # Penalizar flores muy visitadas
+        visit_penalty = np.maximum(0, 1 - visits * 0.1)
+        return base_weight * visit_penalty
+    
+    if drone_type == 'observer':
+        # Abejas observadoras: siguen a las obreras (flores de alta calidad)
+        # Prefieren flores con alta madurez y baja polinización
+        maturity_bonus = maturity * 2
+        pollination_penalty = np.maximum(0.1, 1 - pollination / 100)
+        return base_weight * maturity_bonus * pollination_penalty
+    
+    # scout: abejas exploradoras, buscan nuevas áreas
+    # Prefieren flores menos visitadas, con un factor de exploración aleatoria
+    visit_weight = np.maximum(0.1, 1 - visits * 0.2)
+    return visit_weight * exploration_bonus
+
+def add_phase_time(timings, phase, start):
+    """Sumar a timings[phase] el tiempo transcurrido desde start; devuelve el instante actual"""
+    now = time.perf_counter()
+    if timings is not None:
+        timings[phase] = timings.get(phase, 0) + now - start
+    return now
+
+class FlowerView:
+    """Vista tipo diccionario de una flor almacenada en los arreglos del invernadero"""
+    __slots__ = ('greenhouse', 'id')
+    
+    def __init__(self, greenhouse, flower_id):
+        self.greenhouse = greenhouse
+        self.id = flower_id
+    
+    def __getitem__(self, key):
+        if key == 'id':
+            return self.id
+        if key == 'position':
+            return self.greenhouse.flower_positions[self.id]
+        return getattr(self.greenhouse, FLOWER_ARRAYS[key])[self.id].item()
+    
+    def __setitem__(self, key, value):
+        if key == 'id':
+            raise KeyError("El ID de una flor no se puede modificar")
+        if key == 'position':
+            self.greenhouse.flower_positions[self.id] = value
+        elif key == 'pollination_level':
+            self.greenhouse.set_pollination(self.id, value)
+        elif key == 'visits':
+            self.greenhouse.add_visits(self.id, value - self.greenhouse.flower_visits[self.id])
+        else:
+            getattr(self.greenhouse, FLOWER_ARRAYS[key])[self.id] = value
+    
+    def __contains__(self, key):
+        return key in FLOWER_KEYS
+    
+    def get(self, key, default=None):
+        return self[key] if key in FLOWER_KEYS else default
+    
+    def keys(self):
+        return FLOWER_KEYS
+    
+    def copy(self):
+        """Copia independiente como diccionario (por ejemplo, para el historial)"""
+        return {key: self[key].copy() if key == 'position' else self[key] for key in FLOWER_KEYS}
+    
+    def __repr__(self):
+        return f"FlowerView({self.copy()})"
 
 class Greenhouse:
-    def __init__(self, width=20, height=20):
+    def __init__(self, width=20, height=20, seed=None, charging_stations=None, n_flowers=50, layout_rng=None):
         self.width = width
         self.height = height
+        self.n_flowers = n_flowers
         self.flowers = []
-        self.charging_stations = [
-            {'pos': np.array([2, 2]), 'capacity': 3},
-            {'pos': np.array([width-3, height-3]), 'capacity': 3},
-            {'pos': np.array([width-3, 2]), 'capacity': 2},
-            {'pos': np.array([2, height-3]), 'capacity': 2}
-        ]
+        self.rng = np.random.default_rng(seed)  # Generador propio para la dinámica de las flores
+        # Disposición inicial de las flores: random.Random propio o, sin él, el estado global
+        self.layout_rng = random if layout_rng is None else layout_rng
+        if charging_stations is None:
+            charging_stations = self.default_stations(width, height)
+        if not charging_stations:
+            raise ValueError("El invernadero necesita al menos una estación de carga")
+        self.charging_stations = [{'pos': np.asarray(station['pos']), 'capacity': station['capacity']}
+                                  for station in charging_stations]
         self.initialize_flowers()
         
+        # Índices espaciales: celdas del tamaño del radio de percepción de los drones
+        self.perception_radius = 3
+        self.flower_index = SpatialGrid(self.flower_positions, self.perception_radius, width, height)
+        self.station_index = SpatialGrid([station['pos'] for station in self.charging_stations],
+                                         self.perception_radius, width, height)
+        # Tabla de estación más cercana con unas 16 celdas por estación
+        lookup_cell = max(1, np.sqrt(width * height / len(self.charging_stations)) / 4)
+        self.station_lookup = NearestPointLookup(self.station_index.points, lookup_cell, width, height)
+        
     def initialize_flowers(self):
         """Inicializar flores con diferentes niveles de madurez"""
         # Distribuir flores en el invernadero
-        n_flowers = 50
+        n_flowers = self.n_flowers
+        positions = []
+        maturities = []
         for _ in range(n_flowers):
-            x = random.uniform(0, self.width)
-            y = random.uniform(0, self.height)
-            maturity = random.choice([1, 2, 3, 4, 5])  # 1: baja, 5: alta prioridad
-            pollination_level = 0  # 0-100%
-            self.flowers.append({
-                'position': np.array([x, y]),
-                'maturity': maturity,
-                'pollination_level': pollination_level,
-                'visits': 0,
-                'id': len(self.flowers)  # Añadir un ID único para cada flor
-            })
+            x = self.layout_rng.uniform(0, self.width)
+            y = self.layout_rng.uniform(0, self.height)
+            maturity = self.layout_rng.choice([1, 2, 3, 4, 5])  # 1: baja, 5: alta prioridad
+            positions.append([x, y])
+            maturities.append(maturity)
+        
+        # Estado de las flores como arreglos indexados por ID (la posición en el arreglo)
+        self.flower_positions = np.array(positions, dtype=float).reshape(-1, 2)
+        self.flower_maturity = np.array(maturities, dtype=int)
+        self.flower_pollination = np.zeros(n_flowers)  # 0-100%
+        self.flower_visits = np.zeros(n_flowers, dtype=int)
+        
+        # Acceso tipo diccionario: self.flowers[i]['maturity'], etc.
+        self.flowers = [FlowerView(self, flower_id) for flower_id in range(n_flowers)]
+        
+        # Totales para las métricas, mantenidos donde cambian la polinización y las visitas
+        self.recount_totals()
+    
+    @staticmethod
+    def default_stations(width, height):
+        """Las cuatro estaciones de carga por defecto, cerca de las esquinas del invernadero"""
+        return [
+            {'pos': np.array([2, 2]), 'capacity': 3},
+            {'pos': np.array([width-3, height-3]), 'capacity': 3},
+            {'pos': np.array([width-3, 2]), 'capacity': 2},
+            {'pos': np.array([2, height-3]), 'capacity': 2}
+        ]
+    
+    @staticmethod
+    def grid_stations(width, height, n_cols, n_rows, capacity=3):
+        """Estaciones de carga en una rejilla regular de n_cols x n_rows sobre el invernadero"""
+        xs = (np.arange(n_cols) + 0.5) * width / n_cols
+        ys = (np.arange(n_rows) + 0.5) * height / n_rows
+        return [{'pos': np.array([x, y]), 'capacity': capacity} for x in xs for y in ys]
     
     def update_flowers(self):
         """Actualizar estado de las flores (maduración, polinización)"""
-        for flower in self.flowers:
-            # Las flores maduran con el tiempo (máximo 5)
-            if flower['maturity'] < 5 and random.random() < 0.02:
-                flower['maturity'] += 1
-            
-            # La polinización disminuye lentamente si no es visitada
-            if flower['pollination_level'] > 0 and random.random() < 0.05:
-                flower['pollination_level'] *= 0.98
+        # Todos los sorteos de la iteración en una sola llamada al generador
+        maturation_draw, decay_draw = self.rng.random((2, len(self.flowers)))
+        
+        # Las flores maduran con el tiempo (máximo 5)
+        matures = (self.flower_maturity < 5) & (maturation_draw < 0.02)
+        self.flower_maturity[matures] += 1
+        
+        # La polinización disminuye lentamente si no es visitada
+        decays = np.flatnonzero((self.flower_pollination > 0) & (decay_draw < 0.05))
+        self.set_pollination(decays, self.flower_pollination[decays] * 0.98)
+    
+    def recount_totals(self):
+        """Recalcular desde los arreglos los totales de polinización, visitas y flores sobre el 80%"""
+        self.pollination_total = float(self.flower_pollination.sum())
+        self.visits_total = int(self.flower_visits.sum())
+        self.well_pollinated = int(np.count_nonzero(self.flower_pollination >= 80))
+    
+    def set_pollination(self, flower_ids, levels):
+        """Asignar niveles de polinización (IDs sin repetir) actualizando los totales"""
+        before = self.flower_pollination[flower_ids]
+        self.flower_pollination[flower_ids] = levels
+        after = self.flower_pollination[flower_ids]
+        self.pollination_total += float(np.sum(after - before))
+        self.well_pollinated += int(np.count_nonzero(after >= 80)) - int(np.count_nonzero(before >= 80))
+    
+    def add_visits(self, flower_ids, counts=1):
+        """Sumar visitas a las flores (los IDs pueden repetirse) actualizando el total"""
+        np.add.at(self.flower_visits, flower_ids, counts)
+        self.visits_total += int(np.sum(np.broadcast_to(counts, np.shape(flower_ids))))
+    
+    def flower_quality(self, flower_ids):
+        """Calidad observable de las flores: madurez por fracción polinizada"""
+        return self.flower_maturity[flower_ids] * (self.flower_pollination[flower_ids] / 100)
+    
+    def flowers_near(self, x, y, radius=None):
+        """IDs de las flores a menos de `radius` (por defecto, el radio de percepción)"""
+        return self.flower_index.query_radius(x, y, self.perception_radius if radius is None else radius)
+    
+    def nearest_charging_station(self, x, y):
+        """Estación de carga más cercana a (x, y)"""
+        return self.charging_stations[self.station_lookup.nearest(x, y)]
+    
+    def nearest_station_ids(self, positions):
+        """Índice de la estación más cercana para varias posiciones (n, 2) a la vez"""
+        return self.station_lookup.query(positions[:, 0], positions[:, 1])
+
+class ChargingScheduler:
+    """Reservas y colas de las estaciones de carga respetando su capacidad
+    
+    Cada drone que vuelve a cargar reserva la estación donde terminaría antes de
+    cargar, estimando el viaje, el tiempo de espera por un puesto libre y la
+    duración de la carga. En la estación, si todos los puestos están ocupados,
+    espera en una cola FIFO hasta que otro drone termine.
+    """
+    def __init__(self, greenhouse, speed=0.3, full_battery=95):
+        self.greenhouse = greenhouse
+        self.speed = speed
+        self.full_battery = full_battery
+        self.now = 0
+        
+        stations = greenhouse.charging_stations
+        self.positions = greenhouse.station_index.points
+        self.capacity = np.array([station['capacity'] for station in stations], dtype=int)
+        # Instante estimado en que queda libre cada puesto, como matriz estación x puesto
+        # (los puestos que no existen en estaciones de menor capacidad valen inf)
+        self.slot_exists = np.arange(self.capacity.max(initial=0)) < self.capacity[:, None]
+        self.slot_free_at = np.where(self.slot_exists, 0.0, np.inf)
+        self.charging = [set() for _ in stations]  # Drones cargando en cada estación
+        self.queues = [[] for _ in stations]  # Drones esperando un puesto, en orden de llegada
+        self.reservations = {}  # drone -> (estación, puesto, fin estimado)
+    
+    def tick(self):
+        """Avanzar el reloj del planificador una iteración"""
+        self.now += 1
+    
+    def reserve(self, drone_id, x, y, battery, consumption_rate, charging_rate):
+        """Reservar la estación con la carga completa más temprana; devuelve su índice"""
+        if drone_id in self.reservations:
+            return self.reservations[drone_id][0]
+        
+        # Viaje y carga estimados para cada estación
+        distance = np.hypot(self.positions[:, 0] - x, self.positions[:, 1] - y)
+        arrival = self.now + distance / self.speed
+        arrival_battery = np.maximum(0, battery - distance * consumption_rate)
+        charge_time = np.ceil(np.maximum(0, self.full_battery - arrival_battery) / charging_rate)
+        
+        # Primer puesto libre de cada estación
+        slots = np.argmin(self.slot_free_at, axis=1)
+        free_at = self.slot_free_at[np.arange(len(slots)), slots]
+        finish = np.maximum(arrival, free_at) + charge_time
+        
+        station = int(np.argmin(finish))
+        self.slot_free_at[station, slots[station]] = finish[station]
+        self.reservations[drone_id] = (station, slots[station], finish[station])
+        return station
+    
+    def station_position(self, drone_id):
+        """Posición de la estación reservada por un drone"""
+        return self.positions[self.reservations[drone_id][0]]
+    
+    def arrive(self, drone_id):
+        """Llegada a la estación reservada; True si empieza a cargar, False si queda en cola"""
+        station = self.reservations[drone_id][0]
+        if len(self.charging[station]) < self.capacity[station]:
+            self.charging[station].add(drone_id)
+            return True
+        self.queues[station].append(drone_id)
+        return False
+    
+    def is_charging(self, drone_id):
+        """Indica si el drone ocupa un puesto de carga"""
+        reservation = self.reservations.get(drone_id)
+        return reservation is not None and drone_id in self.charging[reservation[0]]
+    
+    def release(self, drone_id):
+        """Liberar el puesto al terminar de cargar; devuelve el drone de la cola que pasa a cargar"""
+        station, slot, finish = self.reservations.pop(drone_id)
+        self.charging[station].discard(drone_id)
+        # Corregir la estimación del puesto con el instante real de salida
+        self.slot_free_at[station, slot] = max(self.now, self.slot_free_at[station, slot] + self.now - finish)
+        if self.queues[station]:
+            next_drone = self.queues[station].pop(0)
+            self.charging[station].add(next_drone)
+            return next_drone
+        return None
+    
+    def get_state(self):
+        """Estado del planificador como arreglos (para puntos de control)"""
+        reservations = sorted(self.reservations.items())
+        charging = [(station, drone) for station, drones in enumerate(self.charging) for drone in sorted(drones)]
+        queued = [(station, drone) for station, queue in enumerate(self.queues) for drone in queue]
+        return {
+            'now': np.array(self.now),
+            'slot_free_at': self.slot_free_at[self.slot_exists],
+            'reservation_drones': np.array([drone for drone, _ in reservations], dtype=int),
+            'reservations': np.array([reservation for _, reservation in reservations], dtype=float).reshape(-1, 3),
+            'charging': np.array(charging, dtype=int).reshape(-1, 2),
+            'queued': np.array(queued, dtype=int).reshape(-1, 2)
+        }
+    
+    def set_state(self, state):
+        """Restaurar el estado guardado con get_state"""
+        self.now = int(state['now'])
+        self.slot_free_at = np.where(self.slot_exists, 0.0, np.inf)
+        self.slot_free_at[self.slot_exists] = state['slot_free_at']
+        self.reservations = {int(drone): (int(station), int(slot), finish)
+                             for drone, (station, slot, finish) in zip(state['reservation_drones'],
+                                                                       state['reservations'])}
+        self.charging = [set() for _ in self.capacity]
+        for station, drone in state['charging']:
+            self.charging[station].add(int(drone))
+        self.queues = [[] for _ in self.capacity]
+        for station, drone in state['queued']:
+            self.queues[station].append(int(drone))
+
+def remove_files(paths):
+    """Borrar archivos temporales ignorando los que ya no existen"""
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+class TrajectoryBuffer:
+    """Recorridos de todos los drones de un enjambre con memoria acotada
+    
+    policy: 'last' (últimos max_points puntos por drone, en anillo),
+    'decimate' (max_points puntos por drone; al llenarse se descarta uno de cada
+    dos y se duplica el intervalo de muestreo) o 'spool' (recorrido completo,
+    volcado por bloques de chunk_size puntos a un archivo leído con memmap).
+    En 'spool' sin path, el archivo temporal que crea la clase se borra con
+    close() o al liberarse el buffer.
+    """
+    SPOOL_DTYPE = np.dtype([('drone', np.int32), ('x', np.float64), ('y', np.float64)])
+    
+    def __init__(self, n_drones, policy='last', max_points=200, path=None, chunk_size=4096):
+        if policy not in ('last', 'decimate', 'spool'):
+            raise ValueError(f"Política de recorrido desconocida: {policy}")
+        if max_points < 2:
+            raise ValueError("max_points debe ser al menos 2")
+        self.policy = policy
+        self.max_points = max_points
+        self.path = None
+        self.cleanup = None
+        
+        if policy == 'spool':
+            if path is None:
+                fd, path = tempfile.mkstemp(prefix='bee_paths_', suffix='.dat')
+                os.close(fd)
+                self.cleanup = weakref.finalize(self, remove_files, [path])
+            else:
+                open(path, 'wb').close()
+            self.path = path
+            self.spooled = 0
+            self.pending = np.empty(chunk_size, dtype=self.SPOOL_DTYPE)
+            self.n_pending = 0
+        else:
+            self.points_data = np.empty((n_drones, max_points, 2))
+            self.count = np.zeros(n_drones, dtype=int)  # Puntos guardados (en 'last', recibidos)
+            self.seen = np.zeros(n_drones, dtype=int)  # Puntos recibidos (en 'decimate')
+            self.interval = np.ones(n_drones, dtype=int)  # Intervalo de muestreo (en 'decimate')
+    
+    def append(self, drone_id, x, y):
+        """Añadir un punto al recorrido de un drone"""
+        self.append_many(np.array([drone_id]), np.array([[x, y]]))
+    
+    def append_many(self, drone_ids, positions):
+        """Añadir un punto a cada uno de los drones indicados (IDs distintos)"""
+        drone_ids = np.asarray(drone_ids, dtype=int)
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        if self.policy == 'last':
+            self.points_data[drone_ids, self.count[drone_ids] % self.max_points] = positions
+            self.count[drone_ids] += 1
+        elif self.policy == 'decimate':
+            keep = self.seen[drone_ids] % self.interval[drone_ids] == 0
+            self.seen[drone_ids] += 1
+            drone_ids, positions = drone_ids[keep], positions[keep]
+            # Drones con el buffer lleno: quedarse con uno de cada dos puntos
+            for i in drone_ids[self.count[drone_ids] == self.max_points]:
+                kept = self.points_data[i, ::2].copy()
+                self.points_data[i, :len(kept)] = kept
+                self.count[i] = len(kept)
+                self.interval[i] *= 2
+            self.points_data[drone_ids, self.count[drone_ids]] = positions
+            self.count[drone_ids] += 1
+        else:
+            for start in range(0, len(drone_ids), len(self.pending)):
+                self.spool(drone_ids[start:start + len(self.pending)],
+                           positions[start:start + len(self.pending)])
+    
+    def spool(self, drone_ids, positions):
+        """Copiar puntos al bloque pendiente, escribiéndolo a disco cuando se llena"""
+        n = len(drone_ids)
+        if self.n_pending + n > len(self.pending):
+            self.flush()
+        rows = self.pending[self.n_pending:self.n_pending + n]
+        rows['drone'] = drone_ids
+        rows['x'] = positions[:, 0]
+        rows['y'] = positions[:, 1]
+        self.n_pending += n
+    
+    def flush(self):
+        """Escribir a disco el bloque pendiente (solo en política 'spool')"""
+        if self.policy != 'spool' or self.n_pending == 0:
+            return
+        with open(self.path, 'ab') as f:
+            self.pending[:self.n_pending].tofile(f)
+        self.spooled += self.n_pending
+        self.n_pending = 0
+    
+    def close(self):
+        """Borrar el archivo temporal propio (si lo hay); el buffer deja de usarse"""
+        if self.cleanup is not None:
+            self.cleanup()
+    
+    def points(self, drone_id):
+        """Recorrido guardado de un drone como arreglo (k, 2), del más antiguo al más reciente"""
+        if self.policy == 'spool':
+            self.flush()
+            if self.spooled == 0:
+                return np.empty((0, 2))
+            rows = np.memmap(self.path, dtype=self.SPOOL_DTYPE, mode='r', shape=(self.spooled,))
+            rows = rows[rows['drone'] == drone_id]
+            return np.column_stack([rows['x'], rows['y']])
+        count = self.count[drone_id]
+        if self.policy == 'last' and count > self.max_points:
+            # Reordenar el anillo empezando por el punto más antiguo
+            return np.roll(self.points_data[drone_id], -(count % self.max_points), axis=0)
+        return self.points_data[drone_id, :count].copy()
+    
+    def get_state(self):
+        """Recorridos guardados como arreglos (para puntos de control)"""
+        if self.policy == 'spool':
+            self.flush()
+            rows = np.fromfile(self.path, dtype=self.SPOOL_DTYPE, count=self.spooled)
+            return {'spooled': rows}
+        return {'points': self.points_data, 'count': self.count, 'seen': self.seen, 'interval': self.interval}
+    
+    def set_state(self, state):
+        """Restaurar los recorridos guardados con get_state"""
+        if self.policy == 'spool':
+            with open(self.path, 'wb') as f:
+                state['spooled'].tofile(f)
+            self.spooled = len(state['spooled'])
+            self.n_pending = 0
+            return
+        self.points_data = state['points'].copy()
+        self.count = state['count'].copy()
+        self.seen = state['seen'].copy()
+        self.interval = state['interval'].copy()
+
+class HiveMemory:
+    """Memoria compartida de la colmena: calidad observada de cada flor por drone
+    
+    Solo se guardan los pares (drone, flor) conocidos, en arreglos ordenados por
+    la clave drone * n_flowers + flor y consultados con searchsorted: quality es
+    la última calidad observada y last_seen la iteración de esa observación
+    (unos 20 bytes por par conocido, en lugar de una matriz drones x flores).
+    waggle_dance reparte los mejores sitios que conocen las recolectoras entre
+    las observadoras.
+    
+    La memoria envejece: una flor conocida solo se vuelve a evaluar cuando el
+    drone la tiene dentro de su radio de percepción (o recibe una danza más
+    reciente); mientras tanto conserva la calidad de la última observación,
+    aunque la flor madure o se polinice. Esto cambia los pesos de selección ABC
+    respecto a los diccionarios por drone originales, que renovaban en cada
+    iteración la calidad de todas las flores conocidas: obreras y observadoras
+    ponderan con la última calidad observada, aun con las danzas desactivadas.
+    """
+    def __init__(self, n_drones, n_flowers):
+        self.now = 0
+        self.n_drones = n_drones
+        self.n_flowers = n_flowers
+        self.keys = np.empty(0, dtype=np.int64)
+        self.quality = np.empty(0)
+        self.last_seen = np.empty(0, dtype=np.int32)
+    
+    def tick(self):
+        """Avanzar el reloj de la memoria una iteración"""
+        self.now += 1
+    
+    def pair_keys(self, drone_ids, flower_ids):
+        """Claves ordenables de los pares (drone, flor)"""
+        return np.asarray(drone_ids, dtype=np.int64) * self.n_flowers + np.asarray(flower_ids, dtype=np.int64)
+    
+    def find(self, keys):
+        """Posición de cada clave en los arreglos y si el par es conocido"""
+        index = np.searchsorted(self.keys, keys)
+        found = index < self.keys.size
+        found[found] = self.keys[index[found]] == keys[found]
+        return index, found
+    
+    def knows(self, drone_ids, flower_ids):
+        """Máscara de los pares (drone, flor) conocidos"""
+        return self.find(self.pair_keys(drone_ids, flower_ids))[1]
+    
+    def recall(self, drone_ids, flower_ids):
+        """Calidad recordada de cada par (drone, flor); nan si no lo conoce"""
+        index, found = self.find(self.pair_keys(drone_ids, flower_ids))
+        quality = np.full(found.shape, np.nan)
+        quality[found] = self.quality[index[found]]
+        return quality
+    
+    def known_pairs(self, drone_ids):
+        """Flores conocidas por cada drone de drone_ids, como (fila en drone_ids, flor, posición)
+        
+        Dentro de cada drone las flores van en orden de ID.
+        """
+        drone_ids = np.asarray(drone_ids, dtype=np.int64)
+        starts = np.searchsorted(self.keys, drone_ids * self.n_flowers)
+        counts = np.searchsorted(self.keys, (drone_ids + 1) * self.n_flowers) - starts
+        rows = np.repeat(np.arange(drone_ids.size), counts)
+        index = np.arange(rows.size) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(starts, counts)
+        return rows, self.keys[index] - drone_ids[rows] * self.n_flowers, index
+    
+    def has_known(self, drone_ids):
+        """Indica qué drones conocen al menos una flor"""
+        drone_ids = np.asarray(drone_ids, dtype=np.int64)
+        starts = np.searchsorted(self.keys, drone_ids * self.n_flowers)
+        return np.searchsorted(self.keys, (drone_ids + 1) * self.n_flowers) > starts
+    
+    def known_flowers(self, drone_id):
+        """IDs de las flores que conoce un drone, en orden de ID"""
+        return self.known_pairs([drone_id])[1]
+    
+    def store(self, keys, quality, seen_at, replace_equal):
+        """Guardar observaciones por clave, conservando en cada par la más reciente
+        
+        Con replace_equal, una observación de la misma iteración que la guardada
+        la reemplaza. Devuelve la máscara de las claves que eran nuevas.
+        """
+        index, found = self.find(keys)
+        current = self.last_seen[index[found]]
+        newer = seen_at[found] >= current if replace_equal else seen_at[found] > current
+        update = index[found][newer]
+        self.quality[update] = quality[found][newer]
+        self.last_seen[update] = seen_at[found][newer]
+        
+        new = ~found
+        if new.any():
+            self.keys = np.insert(self.keys, index[new], keys[new])
+            self.quality = np.insert(self.quality, index[new], quality[new])
+            self.last_seen = np.insert(self.last_seen, index[new], seen_at[new])
+        return new
+    
+    def observe(self, drone_ids, flower_ids, quality):
+        """Registrar en bloque observaciones (drone, flor, calidad) de esta iteración
+        
+        Si un par se repite se conserva la última observación.
+        """
+        keys = self.pair_keys(drone_ids, flower_ids).reshape(-1)
+        if keys.size == 0:
+            return
+        quality = np.broadcast_to(np.asarray(quality, dtype=float), keys.shape)
+        # Una observación por par, con las claves en orden
+        order = np.argsort(keys, kind='stable')
+        keys, quality = keys[order], quality[order]
+        last = np.r_[keys[1:] != keys[:-1], True]
+        seen_at = np.full(keys.size, self.now, dtype=np.int32)
+        self.store(keys[last], quality[last], seen_at[last], replace_equal=True)
+    
+    def waggle_dance(self, dancers, followers, n_sites):
+        """Compartir con los seguidores los n_sites sitios de mayor calidad de los bailarines
+        
+        Para cada flor se toma la observación más reciente entre los bailarines
+        (con empate, la del primero); un seguidor la adopta si es más reciente
+        que la suya. Devuelve los pares (seguidor, flor) que el seguidor no conocía.
+        """
+        dancers = np.asarray(dancers, dtype=int)
+        followers = np.asarray(followers, dtype=int)
+        empty = (np.empty(0, dtype=int), np.empty(0, dtype=int))
+        if dancers.size == 0 or followers.size == 0 or n_sites <= 0:
+            return empty
+        
+        # Observación más reciente de cada flor entre los bailarines
+        rows, flowers, index = self.known_pairs(dancers)
+        seen = self.last_seen[index]
+        order = np.lexsort((rows, -seen.astype(np.int64), flowers))
+        flowers, index = flowers[order], index[order]
+        newest = np.r_[True, flowers[1:] != flowers[:-1]]
+        sites, latest, shared_quality = flowers[newest], self.last_seen[index[newest]], self.quality[index[newest]]
+        
+        # Mejores sitios con calidad positiva
+        positive = shared_quality > 0
+        sites, latest, shared_quality = sites[positive], latest[positive], shared_quality[positive]
+        if sites.size > n_sites:
+            best = np.argsort(-shared_quality, kind='stable')[:n_sites]
+            sites, latest, shared_quality = sites[best], latest[best], shared_quality[best]
+        if sites.size == 0:
+            return empty
+        
+        # Pares seguidor x sitio, en orden de clave
+        follower_index, site_index = np.divmod(np.arange(followers.size * sites.size), sites.size)
+        keys = self.pair_keys(followers[follower_index], sites[site_index])
+        order = np.argsort(keys, kind='stable')
+        new = np.zeros(keys.size, dtype=bool)
+        new[order] = self.store(keys[order], shared_quality[site_index][order], latest[site_index][order],
+                                replace_equal=False)
+        return followers[follower_index[new]], sites[site_index[new]]
+    
+    def get_state(self):
+        """Memoria como arreglos (para puntos de control)"""
+        return {'now': np.array(self.now), 'keys': self.keys, 'quality': self.quality,
+                'last_seen': self.last_seen}
+    
+    def set_state(self, state):
+        """Restaurar la memoria guardada con get_state"""
+        self.now = int(state['now'])
+        self.keys = state['keys'].copy()
+        self.quality = state['quality'].copy()
+        self.last_seen = state['last_seen'].copy()
 
 class BeeDrone:
-    def __init__(self, x, y, drone_id, drone_type, greenhouse):
+    def __init__(self, x, y, drone_id, drone_type, greenhouse, trajectory=None, scheduler=None, hive=None,
+                 rng=None, np_rng=None):
         self.x = x
         self.y = y
         self.id = drone_id
         self.type = drone_type  # 'worker', 'observer', 'scout'
         self.greenhouse = greenhouse
+        # Generadores de las decisiones (por defecto, los estados globales de random y np.random)
+        self.rng = random if rng is None else rng
+        self.np_rng = np.random if np_rng is None else np_rng
         
         # Estado y energía
         self.battery = 100
         self.energy_consumption_rate = 0.5  # Por unidad de movimiento
         self.charging_rate = 5  # Por iteración de carga
-        self.state = 'exploring'  # 'exploring', 'pollinating', 'charging', 'returning'
+        self.state = 'exploring'  # 'exploring', 'pollinating', 'charging', 'returning', 'waiting'
+        self.scheduler = scheduler  # ChargingScheduler opcional (sin él, estación más cercana sin límite)
         
         # Objetivos y memoria
         self.target_flower = None
-        self.known_flowers = []  # IDs de flores que conoce este drone
-        self.flower_memory = {}  # Memoria de calidad de flores
-        self.path = [(x, y)]
+        # Memoria en la colmena compartida (fila = ID del drone)
+        if hive is None:
+            hive = HiveMemory(drone_id + 1, len(greenhouse.flowers))
+        self.hive = hive
+        self.known_flowers = []  # IDs de flores que conoce este drone (en orden de descubrimiento)
+        
+        # Recorrido en un buffer compartido por el enjambre (fila = ID del drone);
+        # para la batería basta con la posición anterior al último movimiento
+        if trajectory is None:
+            trajectory = TrajectoryBuffer(drone_id + 1)
+        self.trajectory = trajectory
+        self.trajectory.append(drone_id, x, y)
+        self.last_position = None
         
         # Estadísticas
         self.flowers_pollinated = 0
@@ -84,39 +813,47 @@ class BeeDrone:
     
     def update_battery(self):
         """Actualizar nivel de batería"""
+        # En cola: empieza a cargar cuando el planificador le asigna un puesto
+        if self.state == 'waiting' and self.scheduler.is_charging(self.id):
+            self.state = 'charging'
+        
         if self.state == 'charging':
             self.battery = min(100, self.battery + self.charging_rate)
             self.charging_time += 1
             if self.battery >= 95:
                 self.state = 'exploring'
+                if self.scheduler is not None:
+                    self.scheduler.release(self.id)
+        elif self.state == 'waiting':
+            # Detenido en la estación, sin consumir energía
+            pass
         else:
             # Consumo de energía proporcional a la distancia recorrida
-            if len(self.path) > 1:
-                last_pos = self.path[-2]
-                current_pos = self.path[-1]
-                distance = np.sqrt((current_pos[0]-last_pos[0])**2 + (current_pos[1]-last_pos[1])**2)
+            if self.last_position is not None:
+                last_pos = self.last_position
+                distance = np.sqrt((self.x-last_pos[0])**2 + (self.y-last_pos[1])**2)
                 self.battery = max(0, self.battery - distance * self.energy_consumption_rate)
             
             # Si la batería es baja, ir a cargar
             if self.battery < 20 and self.state != 'returning':
                 self.state = 'returning'
                 self.target_flower = None
+                if self.scheduler is not None:
+                    self.scheduler.reserve(self.id, self.x, self.y, self.battery,
+                                           self.energy_consumption_rate, self.charging_rate)
+    
+    @property
+    def path(self):
+        """Recorrido guardado según la política del buffer, como lista de (x, y)"""
+        return [tuple(point) for point in self.trajectory.points(self.id).tolist()]
     
     def find_nearest_charging_station(self):
         """Encontrar la estación de carga más cercana"""
-        min_distance = float('inf')
-        best_station = None
-        
-        for station in self.greenhouse.charging_stations:
-            distance = np.sqrt((self.x - station['pos'][0])**2 + (self.y - station['pos'][1])**2)
-            if distance < min_distance:
-                min_distance = distance
-                best_station = station
-        
-        return best_station
+        return self.greenhouse.nearest_charging_station(self.x, self.y)
     
     def move_toward_target(self, target_x, target_y, speed=0.3):
         """Moverse hacia un objetivo"""
+        self.last_position = (self.x, self.y)
         dx = target_x - self.x
         dy = target_y - self.y
         distance = np.sqrt(dx**2 + dy**2)
@@ -127,29 +864,27 @@ class BeeDrone:
             self.y += (dy / distance) * speed
             self.distance_traveled += speed
         
-        self.path.append((self.x, self.y))
+        self.trajectory.append(self.id, self.x, self.y)
         return distance
     
     def update_known_flowers(self):
         """Actualizar lista de flores conocidas basado en proximidad"""
-        for flower in self.greenhouse.flowers:
-            distance = np.sqrt((self.x - flower['position'][0])**2 + 
-                             (self.y - flower['position'][1])**2)
-            
-            # Si está cerca, añadir a flores conocidas (por ID)
-            if distance < 3 and flower['id'] not in self.known_flowers:
-                self.known_flowers.append(flower['id'])
-                
-            # Actualizar memoria de calidad de flor
-            if flower['id'] in self.known_flowers:
-                quality_score = flower['maturity'] * (flower['pollination_level'] / 100)
-                self.flower_memory[flower['id']] = quality_score
+        # Solo se consultan las celdas del índice espacial cercanas al drone
+        nearby = self.greenhouse.flowers_near(self.x, self.y)
+        
+        # Si está cerca, añadir a flores conocidas (por ID)
+        new_flowers = nearby[~self.hive.knows(self.id, nearby)]
+        if new_flowers.size:
+            self.known_flowers.extend(new_flowers.tolist())
+        
+        # Solo se actualiza la calidad de las flores observadas ahora
+        if nearby.size:
+            self.hive.observe(self.id, nearby, self.greenhouse.flower_quality(nearby))
     
     def get_flower_by_id(self, flower_id):
         """Obtener flor por ID"""
-        for flower in self.greenhouse.flowers:
-            if flower['id'] == flower_id:
-                return flower
+        if 0 <= flower_id < len(self.greenhouse.flowers):
+            return self.greenhouse.flowers[flower_id]
         return None
     
     def select_flower_abc(self):
@@ -157,63 +892,30 @@ class BeeDrone:
         if not self.known_flowers:
             return None
         
-        if self.type == 'worker':
-            # Abejas obreras: seleccionan basado en calidad conocida
-            weights = []
-            for flower_id in self.known_flowers:
-                flower = self.get_flower_by_id(flower_id)
-                if flower is None:
-                    continue
-                    
-                base_weight = self.flower_memory.get(flower_id, flower['maturity'])
-                # Penalizar flores muy visitadas
-                visit_penalty = max(0, 1 - flower['visits'] * 0.1)
-                weight = base_weight * visit_penalty
-                weights.append(weight)
-            
-        elif self.type == 'observer':
-            # Abejas observadoras: siguen a las obreras (flores de alta calidad)
-            weights = []
-            for flower_id in self.known_flowers:
-                flower = self.get_flower_by_id(flower_id)
-                if flower is None:
-                    continue
-                    
-                base_weight = self.flower_memory.get(flower_id, flower['maturity'])
-                # Prefieren flores con alta madurez y baja polinización
-                maturity_bonus = flower['maturity'] * 2
-                pollination_penalty = max(0.1, 1 - flower['pollination_level'] / 100)
-                weight = base_weight * maturity_bonus * pollination_penalty
-                weights.append(weight)
-                
-        else:  # scout
-            # Abejas exploradoras: buscan nuevas áreas
-            weights = []
-            for flower_id in self.known_flowers:
-                flower = self.get_flower_by_id(flower_id)
-                if flower is None:
-                    continue
-                    
-                # Prefieren flores menos visitadas
-                visit_weight = max(0.1, 1 - flower['visits'] * 0.2)
-                # Exploración aleatoria
-                exploration_bonus = random.uniform(0.5, 1.5)
-                weight = visit_weight * exploration_bonus
-                weights.append(weight)
+        greenhouse = self.greenhouse
+        known = np.asarray(self.known_flowers, dtype=int)
+        maturity = greenhouse.flower_maturity[known]
+        visits = greenhouse.flower_visits[known]
+        # Calidad recordada; si no hay dato se usa la madurez
+        memory = self.hive.recall(self.id, known)
+        base_weight = np.where(np.isnan(memory), maturity, memory)
+        
+        # Exploración aleatoria de las exploradoras
+        exploration_bonus = None
+        if self.type == 'scout':
+            exploration_bonus = np.array([self.rng.uniform(0.5, 1.5) for _ in known])
+        weights = abc_flower_weights(self.type, maturity, visits, greenhouse.flower_pollination[known],
+                                     base_weight, exploration_bonus)
         
         # Si no hay pesos válidos, retornar None
-        if not weights or sum(weights) == 0:
+        total_weight = weights.sum()
+        if total_weight <= 0:
             return None
             
         # Normalizar pesos
-        total_weight = sum(weights)
-        if total_weight > 0:
-            probabilities = [w / total_weight for w in weights]
-            selected_index = np.random.choice(len(self.known_flowers), p=probabilities)
-            selected_flower_id = self.known_flowers[selected_index]
-            return self.get_flower_by_id(selected_flower_id)
-        
-        return None
+        probabilities = weights / total_weight
+        selected_index = self.np_rng.choice(len(known), p=probabilities)
+        return greenhouse.flowers[known[selected_index]]
     
     def pollinate_flower(self, flower):
         """Polinizar una flor"""
@@ -236,15 +938,20 @@ class BeeDrone:
         
         # Comportamiento basado en estado
         if self.state == 'returning':
-            # Buscar estación de carga
-            station = self.find_nearest_charging_station()
-            if station:
-                distance = self.move_toward_target(station['pos'][0], station['pos'][1])
-                if distance < 0.5:  # Llegó a la estación
+            # Buscar estación de carga (la reservada, si hay planificador)
+            if self.scheduler is not None:
+                station_pos = self.scheduler.station_position(self.id)
+            else:
+                station_pos = self.find_nearest_charging_station()['pos']
+            distance = self.move_toward_target(station_pos[0], station_pos[1])
+            if distance < 0.5:  # Llegó a la estación
+                if self.scheduler is None or self.scheduler.arrive(self.id):
                     self.state = 'charging'
+                else:
+                    self.state = 'waiting'
         
-        elif self.state == 'charging':
-            # Ya está en modo carga, no hacer nada
+        elif self.state in ('charging', 'waiting'):
+            # Ya está en modo carga o en cola, no hacer nada
             pass
         
         elif self.state == 'pollinating' and self.target_flower:
@@ -259,10 +966,10 @@ class BeeDrone:
         
         else:  # exploring
             # Seleccionar nueva flor o explorar
-            if random.random() < self.exploration_factor or not self.known_flowers:
+            if self.rng.random() < self.exploration_factor or not self.known_flowers:
                 # Movimiento exploratorio
-                target_x = self.x + random.uniform(-2, 2)
-                target_y = self.y + random.uniform(-2, 2)
+                target_x = self.x + self.rng.uniform(-2, 2)
+                target_y = self.y + self.rng.uniform(-2, 2)
                 # Mantener dentro del invernadero
                 target_x = max(0, min(self.greenhouse.width, target_x))
                 target_y = max(0, min(self.greenhouse.height, target_y))
@@ -273,110 +980,647 @@ class BeeDrone:
                 if self.target_flower:
                     self.state = 'pollinating'
 
+class BeeFleet:
+    """Estado de todos los drones en arreglos, avanzado por lotes en cada iteración
+    
+    Cada iteración se resuelve en fases sobre todo el enjambre: batería,
+    percepción, decisión, movimiento y polinización. Todas las fases leen el
+    estado del inicio de la fase (actualización síncrona). Si varios drones
+    llegan a la misma flor en la misma iteración, polinizan en orden de ID: cada
+    uno ve el nivel que dejó el anterior, y los que llegan con la flor ya al
+    100% no cuentan visita.
+    """
+    def __init__(self, drones, greenhouse, rng):
+        self.drones = drones
+        self.greenhouse = greenhouse
+        self.rng = rng
+        n = len(drones)
+        
+        # Posición, posición antes del último movimiento (para el consumo de batería) y estado
+        self.positions = np.array([[d.x, d.y] for d in drones], dtype=float).reshape(n, 2)
+        self.has_moved = np.array([d.last_position is not None for d in drones], dtype=bool)
+        self.last_positions = np.array([d.last_position if d.last_position is not None else (d.x, d.y)
+                                        for d in drones], dtype=float).reshape(n, 2)
+        self.trajectory = drones[0].trajectory if drones else None
+        self.scheduler = drones[0].scheduler if drones else None
+        self.battery = np.array([d.battery for d in drones], dtype=float)
+        self.battery_total = float(self.battery.sum())  # Se actualiza con cada cambio de batería
+        self.state = np.array([DRONE_STATES.index(d.state) for d in drones], dtype=np.uint8)
+        self.target = np.array([-1 if d.target_flower is None else d.target_flower['id']
+                                for d in drones], dtype=int)
+        
+        # Parámetros por tipo de drone
+        self.type = np.array([DRONE_TYPES.index(d.type) for d in drones], dtype=np.uint8)
+        self.exploration_factor = np.array([d.exploration_factor for d in drones])
+        self.pollination_efficiency = np.array([d.pollination_efficiency for d in drones])
+        self.charging_rate = np.array([d.charging_rate for d in drones], dtype=float)
+        self.energy_consumption_rate = np.array([d.energy_consumption_rate for d in drones])
+        
+        # Flores conocidas y su calidad recordada: la memoria de la colmena
+        self.hive = drones[0].hive if drones else HiveMemory(0, len(greenhouse.flowers))
+        
+        # Estadísticas
+        self.flowers_pollinated = np.array([d.flowers_pollinated for d in drones], dtype=int)
+        self.total_pollination = np.array([d.total_pollination for d in drones], dtype=float)
+        self.distance_traveled = np.array([d.distance_traveled for d in drones], dtype=float)
+        self.charging_time = np.array([d.charging_time for d in drones], dtype=int)
+    
+    def step(self, timings=None):
+        """Avanzar todos los drones una iteración (tiempos por fase en timings, si se pasa)"""
+        start = time.perf_counter()
+        self.update_battery()
+        start = add_phase_time(timings, 'movement', start)
+        self.update_known_flowers()
+        start = add_phase_time(timings, 'perception', start)
+        explore_move, chose_flower = self.decide()
+        start = add_phase_time(timings, 'decision', start)
+        arrived = self.move(explore_move, chose_flower)
+        self.pollinate(arrived)
+        add_phase_time(timings, 'movement', start)
+    
+    def update_battery(self):
+        """Carga de los drones en estación y consumo del resto"""
+        charging = self.state == CHARGING
+        resting = charging | (self.state == WAITING)
+        charged_battery = np.minimum(100, self.battery[charging] + self.charging_rate[charging])
+        self.battery_total += float(np.sum(charged_battery - self.battery[charging]))
+        self.battery[charging] = charged_battery
+        self.charging_time[charging] += 1
+        charged = np.flatnonzero(charging & (self.battery >= 95))
+        self.state[charged] = EXPLORING
+        
+        # Los puestos liberados pasan al primer drone de la cola de cada estación
+        if self.scheduler is not None:
+            for i in charged:
+                next_drone = self.scheduler.release(i)
+                if next_drone is not None:
+                    self.state[next_drone] = CHARGING
+        
+        # Consumo de energía proporcional al último paso recorrido (no en estación)
+        consuming = ~resting & self.has_moved
+        last_step = np.linalg.norm(self.positions[consuming] - self.last_positions[consuming], axis=1)
+        remaining = np.maximum(0, self.battery[consuming] - last_step * self.energy_consumption_rate[consuming])
+        self.battery_total += float(np.sum(remaining - self.battery[consuming]))
+        self.battery[consuming] = remaining
+        
+        # Si la batería es baja, ir a cargar
+        low = ~resting & (self.battery < 20) & (self.state != RETURNING)
+        self.state[low] = RETURNING
+        self.target[low] = -1
+        if self.scheduler is not None:
+            for i in np.flatnonzero(low):
+                self.scheduler.reserve(i, self.positions[i, 0], self.positions[i, 1], self.battery[i],
+                                       self.energy_consumption_rate[i], self.charging_rate[i])
+    
+    def update_known_flowers(self):
+        """Marcar como conocidas las flores dentro del radio de percepción de cada drone"""
+        owners, flower_ids = self.greenhouse.flower_index.query_radius_many(
+            self.positions[:, 0], self.positions[:, 1], self.greenhouse.perception_radius)
+        self.hive.observe(owners, flower_ids, self.greenhouse.flower_quality(flower_ids))
+    
+    def decide(self):
+        """Los drones explorando eligen flor (ABC) o un movimiento exploratorio
+        
+        Devuelve las máscaras de quién hace un movimiento exploratorio y de quién
+        acaba de elegir flor (como en BeeDrone.update, no se mueve hasta la
+        siguiente iteración).
+        """
+        exploring = np.flatnonzero(self.state == EXPLORING)
+        has_known = self.hive.has_known(exploring)
+        explore_move = np.zeros(len(self.drones), dtype=bool)
+        explore_move[exploring] = (self.rng.random(exploring.size) < self.exploration_factor[exploring]) | ~has_known
+        
+        deciders = exploring[~explore_move[exploring]]
+        flower_ids = self.select_flowers(deciders)
+        chosen = flower_ids >= 0
+        self.target[deciders[chosen]] = flower_ids[chosen]
+        self.state[deciders[chosen]] = POLLINATING
+        chose_flower = np.zeros(len(self.drones), dtype=bool)
+        chose_flower[deciders[chosen]] = True
+        return explore_move, chose_flower
+    
+    def select_flowers(self, deciders):
+        """Seleccionar flor con ABC para varios drones a la vez; -1 si no hay pesos válidos
+        
+        Los pesos se calculan sobre todos los pares (drone, flor conocida) y la
+        elección de cada drone se sortea con Gumbel-max: el par de mayor
+        log(peso) + Gumbel de cada drone sigue la distribución peso / suma.
+        """
+        selected = np.full(deciders.size, -1)
+        rows, flowers, index = self.hive.known_pairs(deciders)
+        if rows.size == 0:
+            return selected
+        
+        greenhouse = self.greenhouse
+        maturity = greenhouse.flower_maturity[flowers]
+        pollination = greenhouse.flower_pollination[flowers]
+        visits = greenhouse.flower_visits[flowers]
+        # Calidad recordada por cada drone; si no hay dato se usa la madurez
+        memory = self.hive.quality[index]
+        base_weight = np.where(np.isnan(memory), maturity, memory)
+        
+        # Pesos por tipo de drone, sobre los pares de cada tipo
+        pair_types = self.type[deciders[rows]]
+        weights = np.zeros(rows.size)
+        for code, drone_type in enumerate(DRONE_TYPES):
+            pairs = pair_types == code
+            if not pairs.any():
+                continue
+            exploration_bonus = self.rng.uniform(0.5, 1.5, pairs.sum()) if drone_type == 'scout' else None
+            weights[pairs] = abc_flower_weights(drone_type, maturity[pairs], visits[pairs], pollination[pairs],
+                                                base_weight[pairs], exploration_bonus)
+        
+        # Gumbel-max por drone (los pares vienen agrupados por fila); peso 0 nunca gana
+        keys = np.full(rows.size, -np.inf)
+        valid = weights > 0
+        keys[valid] = np.log(weights[valid]) + self.rng.gumbel(size=valid.sum())
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        row_max = np.repeat(np.maximum.reduceat(keys, starts), np.diff(np.r_[starts, rows.size]))
+        best = valid & (keys == row_max)
+        best_rows, first = np.unique(rows[best], return_index=True)
+        selected[best_rows] = flowers[best][first]
+        return selected
+    
+    def move(self, explore_move, chose_flower, speed=0.3):
+        """Mover hacia estación, flor o punto exploratorio; devuelve quién llegó
+        
+        Los drones que eligieron flor en esta iteración esperan a la siguiente.
+        """
+        returning = self.state == RETURNING
+        pollinating = (self.state == POLLINATING) & (self.target >= 0) & ~chose_flower
+        moving = returning | pollinating | explore_move
+        targets = np.zeros_like(self.positions)
+        
+        # Estaciones de carga reservadas, o las más cercanas si no hay planificador
+        returning_ids = np.flatnonzero(returning)
+        if returning_ids.size and self.scheduler is not None:
+            targets[returning_ids] = [self.scheduler.station_position(i) for i in returning_ids]
+        elif returning_ids.size:
+            stations = self.greenhouse.nearest_station_ids(self.positions[returning_ids])
+            targets[returning_ids] = self.greenhouse.station_index.points[stations]
+        
+        # Flores objetivo
+        targets[pollinating] = self.greenhouse.flower_positions[self.target[pollinating]]
+        
+        # Movimiento exploratorio aleatorio, dentro del invernadero
+        explorers = np.flatnonzero(explore_move)
+        offsets = self.rng.uniform(-2, 2, (explorers.size, 2))
+        targets[explorers] = self.positions[explorers] + offsets
+        targets[explorers, 0] = np.clip(targets[explorers, 0], 0, self.greenhouse.width)
+        targets[explorers, 1] = np.clip(targets[explorers, 1], 0, self.greenhouse.height)
+        
+        # Paso normalizado de longitud `speed` (la distancia se mide antes de moverse)
+        delta = targets[moving] - self.positions[moving]
+        distance = np.linalg.norm(delta, axis=1)
+        step = np.zeros_like(delta)
+        nonzero = distance > 0
+        step[nonzero] = delta[nonzero] / distance[nonzero, None] * speed
+        
+        moving_ids = np.flatnonzero(moving)
+        self.last_positions[moving_ids] = self.positions[moving_ids]
+        self.positions[moving_ids] += step
+        self.distance_traveled[moving_ids[nonzero]] += speed
+        self.has_moved[moving_ids] = True
+        self.trajectory.append_many(moving_ids, self.positions[moving_ids])
+        
+        pre_move_distance = np.full(len(self.drones), np.inf)
+        pre_move_distance[moving_ids] = distance
+        
+        # Llegada a la estación de carga (o a su cola, si está llena)
+        arrived_station = np.flatnonzero(returning & (pre_move_distance < 0.5))
+        self.state[arrived_station] = CHARGING
+        if self.scheduler is not None:
+            for i in arrived_station:
+                if not self.scheduler.arrive(i):
+                    self.state[i] = WAITING
+        return pollinating & (pre_move_distance < 0.3)
+    
+    def pollinate(self, arrived):
+        """Polinizar las flores alcanzadas, resolviendo llegadas simultáneas en orden de ID"""
+        drones = np.flatnonzero(arrived)
+        self.state[drones] = EXPLORING
+        if drones.size == 0:
+            return
+        flowers = self.target[drones]
+        self.target[drones] = -1
+        
+        # Agrupar por flor, y dentro de cada flor por ID de drone
+        order = np.lexsort((drones, flowers))
+        drones, flowers = drones[order], flowers[order]
+        greenhouse = self.greenhouse
+        amount = self.pollination_efficiency[drones] * (5 + greenhouse.flower_maturity[flowers])
+        
+        # Polinización acumulada de los drones anteriores en la misma flor
+        group_start = np.r_[True, flowers[1:] != flowers[:-1]]
+        cumulative = np.cumsum(amount)
+        first = np.maximum.accumulate(np.where(group_start, np.arange(drones.size), 0))
+        before_sum = cumulative - amount - (cumulative[first] - amount[first])
+        level_before = np.minimum(100, greenhouse.flower_pollination[flowers] + before_sum)
+        pollinates = level_before < 100
+        level_after = np.minimum(100, level_before + amount)
+        
+        # Nivel final de cada flor = el que deja el último drone del grupo
+        last = np.r_[group_start[1:], True]
+        greenhouse.set_pollination(flowers[last], level_after[last])
+        greenhouse.add_visits(flowers[pollinates])
+        
+        self.flowers_pollinated[drones[pollinates & (level_after >= 100)]] += 1
+        self.total_pollination[drones[pollinates]] += amount[pollinates]
+    
+    def sync_drones(self):
+        """Copiar el estado de los arreglos a los objetos BeeDrone"""
+        flowers = self.greenhouse.flowers
+        for i, drone in enumerate(self.drones):
+            drone.x, drone.y = self.positions[i]
+            drone.battery = self.battery[i]
+            drone.state = DRONE_STATES[self.state[i]]
+            drone.target_flower = flowers[self.target[i]] if self.target[i] >= 0 else None
+            drone.known_flowers = self.hive.known_flowers(i).tolist()
+            drone.last_position = tuple(self.last_positions[i]) if self.has_moved[i] else None
+            drone.flowers_pollinated = self.flowers_pollinated[i]
+            drone.total_pollination = self.total_pollination[i]
+            drone.distance_traveled = self.distance_traveled[i]
+            drone.charging_time = self.charging_time[i]
+
+class ABCHistoryRecorder:
+    """Historial columnar de la simulación en arreglos tipados preasignados
+    
+    Las métricas (polinización promedio, energía y visitas) se guardan en cada
+    iteración. Las instantáneas (posiciones float32, estados uint8, batería y
+    polinización float32, madurez uint8) se guardan cada `stride` iteraciones;
+    con mode='metrics' no se guardan instantáneas y con mode='none' no se guarda
+    nada (para consumir la simulación con ABCDroneSwarm.iterate). Los arreglos se
+    preasignan con el tamaño exacto para n_iterations registros y, después, con
+    reserve antes de cada tramo de iteraciones conocido (iterate con max_iterations);
+    solo al registrar más allá de lo reservado (iterate sin límite) crecen al doble.
+    """
+    METRIC_COLUMNS = ('avg_pollination', 'total_energy', 'total_visits')
+    SNAPSHOT_COLUMNS = ('snapshot_iterations', 'drone_positions', 'drone_states', 'drone_battery',
+                        'flower_pollination', 'flower_maturity')
+    
+    def __init__(self, n_drones, n_flowers, drone_types, flower_positions, mode='full', stride=1,
+                 first_iteration=0, n_iterations=1):
+        if mode not in ('full', 'metrics', 'none'):
+            raise ValueError(f"Modo de historial desconocido: {mode}")
+        if stride < 1:
+            raise ValueError("El intervalo de muestreo debe ser al menos 1")
+        self.mode = mode
+        self.stride = stride
+        self.n_records = 0
+        self.n_snapshots = 0
+        
+        # Datos fijos durante la simulación
+        self.drone_types = np.asarray(drone_types, dtype=np.uint8)
+        self.flower_positions = np.asarray(flower_positions, dtype=np.float32).reshape(n_flowers, 2)
+        
+        # Métricas por iteración
+        self.avg_pollination = np.empty(0)
+        self.total_energy = np.empty(0)
+        self.total_visits = np.empty(0, dtype=np.int64)
+        
+        # Instantáneas muestreadas
+        self.snapshot_iterations = np.empty(0, dtype=np.int64)
+        self.drone_positions = np.empty((0, n_drones, 2), dtype=np.float32)
+        self.drone_states = np.empty((0, n_drones), dtype=np.uint8)
+        self.drone_battery = np.empty((0, n_drones), dtype=np.float32)
+        self.flower_pollination = np.empty((0, n_flowers), dtype=np.float32)
+        self.flower_maturity = np.empty((0, n_flowers), dtype=np.uint8)
+        
+        self.reserve(first_iteration, n_iterations)
+    
+    @staticmethod
+    def resize(array, length, capacity):
+        """Copiar los primeros length elementos a un arreglo de capacity en el primer eje"""
+        resized = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+        resized[:length] = array[:length]
+        return resized
+    
+    def reserve(self, first_iteration, n_iterations):
+        """Preasignar espacio para registrar las iteraciones first_iteration .. first_iteration + n_iterations - 1
+        
+        Las instantáneas necesarias se cuentan con el intervalo de muestreo; la
+        capacidad solo aumenta, nunca se recorta lo ya registrado.
+        """
+        if self.mode == 'none' or n_iterations <= 0:
+            return
+        records = self.n_records + n_iterations
+        if records > len(self.avg_pollination):
+            for name in self.METRIC_COLUMNS:
+                setattr(self, name, self.resize(getattr(self, name), self.n_records, records))
+        if self.mode != 'full':
+            return
+        last_iteration = first_iteration + n_iterations - 1
+        snapshots = self.n_snapshots + last_iteration // self.stride - (first_iteration - 1) // self.stride
+        if snapshots > len(self.snapshot_iterations):
+            for name in self.SNAPSHOT_COLUMNS:
+                setattr(self, name, self.resize(getattr(self, name), self.n_snapshots, snapshots))
+    
+    def wants_snapshot(self, iteration):
+        """Indica si en esta iteración corresponde guardar una instantánea"""
+        return self.mode == 'full' and iteration % self.stride == 0
+    
+    def record(self, iteration, avg_pollination, total_energy, total_visits, snapshot=None):
+        """Guardar las métricas de una iteración y, si se pasa, su instantánea
+        
+        snapshot: (posiciones, estados, batería, polinización, madurez) de drones y flores.
+        """
+        if self.mode == 'none':
+            return
+        if self.n_records == len(self.avg_pollination):
+            # Más allá de lo reservado: crecer al doble
+            for name in self.METRIC_COLUMNS:
+                setattr(self, name, self.resize(getattr(self, name), self.n_records, max(2 * self.n_records, 1)))
+        self.avg_pollination[self.n_records] = avg_pollination
+        self.total_energy[self.n_records] = total_energy
+        self.total_visits[self.n_records] = total_visits
+        self.n_records += 1
+        
+        if snapshot is None:
+            return
+        k = self.n_snapshots
+        if k == len(self.snapshot_iterations):
+            for name in self.SNAPSHOT_COLUMNS:
+                setattr(self, name, self.resize(getattr(self, name), k, max(2 * k, 1)))
+        positions, states, battery, pollination, maturity = snapshot
+        self.snapshot_iterations[k] = iteration
+        self.drone_positions[k] = positions
+        self.drone_states[k] = states
+        self.drone_battery[k] = battery
+        self.flower_pollination[k] = pollination
+        self.flower_maturity[k] = maturity
+        self.n_snapshots += 1
+    
+    def get_state(self):
+        """Columnas registradas hasta ahora (para puntos de control)"""
+        k = self.n_snapshots
+        return {
+            'avg_pollination': self.avg_pollination[:self.n_records],
+            'total_energy': self.total_energy[:self.n_records],
+            'total_visits': self.total_visits[:self.n_records],
+            'snapshot_iterations': self.snapshot_iterations[:k],
+            'drone_positions': self.drone_positions[:k],
+            'drone_states': self.drone_states[:k],
+            'drone_battery': self.drone_battery[:k],
+            'flower_pollination': self.flower_pollination[:k],
+            'flower_maturity': self.flower_maturity[:k]
+        }
+    
+    def set_state(self, state):
+        """Restaurar las columnas guardadas con get_state (reserve las amplía para seguir registrando)"""
+        for name, column in state.items():
+            setattr(self, name, column.copy())
+        self.n_records = len(self.avg_pollination)
+        self.n_snapshots = len(self.snapshot_iterations)
+    
+    def __len__(self):
+        return self.n_snapshots
+
 class ABCDroneSwarm:
-    def __init__(self, n_workers=8, n_observers=4, n_scouts=3, greenhouse_size=20):
-        self.greenhouse = Greenhouse(greenhouse_size, greenhouse_size)
+    def __init__(self, n_workers=8, n_observers=4, n_scouts=3, greenhouse_size=20, seed=None,
+                 engine='object', history='full', history_stride=1, trajectory='last',
+                 trajectory_points=200, trajectory_path=None, charging='nearest', n_flowers=50,
+                 charging_stations=None, dance_interval=0, dance_sites=5, check_metrics=False):
+        # Motor: 'object' (BeeDrone.update uno por uno) o 'batched' (BeeFleet, por lotes)
+        if engine not in ('object', 'batched'):
+            raise ValueError(f"Motor desconocido: {engine}")
+        self.engine = engine
+        
+        # Generadores: con seed, propios del enjambre y derivados de ella (flota, disposición de
+        # las flores, posiciones iniciales y decisiones del motor por objetos); sin seed, los
+        # estados globales de random y np.random. La dinámica de las flores usa seed directamente
+        seeds = np.random.SeedSequence(seed).spawn(5)
+        if seed is None:
+            layout_rng, spawn_rng, self.rng, self.np_rng = random, random, random, np.random
+        else:
+            layout_rng = random.Random(int(seeds[1].generate_state(1)[0]))
+            spawn_rng = random.Random(int(seeds[2].generate_state(1)[0]))
+            self.rng = random.Random(int(seeds[3].generate_state(1)[0]))
+            self.np_rng = np.random.RandomState(np.random.MT19937(seeds[4]))
+        self.seeded = seed is not None
+        
+        # Escenario: greenhouse_size es el lado (invernadero cuadrado) o (ancho, alto)
+        width, height = greenhouse_size if np.ndim(greenhouse_size) else (greenhouse_size, greenhouse_size)
+        self.greenhouse = Greenhouse(width, height, seed=seed, charging_stations=charging_stations,
+                                     n_flowers=n_flowers, layout_rng=layout_rng)
         self.drones = []
+        
+        # Carga: 'nearest' (estación más cercana, sin límite de capacidad) o
+        # 'scheduled' (reservas y colas según capacidad, ver ChargingScheduler)
+        if charging not in ('nearest', 'scheduled'):
+            raise ValueError(f"Modo de carga desconocido: {charging}")
+        self.scheduler = ChargingScheduler(self.greenhouse) if charging == 'scheduled' else None
         self.iteration = 0
-        self.history = []
+        
+        # Memoria compartida de la colmena y baile de las recolectoras cada dance_interval
+        # iteraciones (0 lo desactiva), con los dance_sites mejores sitios
+        n_drones = n_workers + n_observers + n_scouts
+        self.hive = HiveMemory(n_drones, len(self.greenhouse.flowers))
+        self.dance_interval = dance_interval
+        self.dance_sites = dance_sites
+        
+        # Recorridos de los drones: 'last', 'decimate' o 'spool' (ver TrajectoryBuffer)
+        self.trajectories = TrajectoryBuffer(n_drones, policy=trajectory,
+                                             max_points=trajectory_points, path=trajectory_path)
         
         # Crear diferentes tipos de drones
         drone_id = 0
         
         # Abejas obreras
         for _ in range(n_workers):
-            x, y = random.uniform(2, greenhouse_size-2), random.uniform(2, greenhouse_size-2)
-            drone = BeeDrone(x, y, drone_id, 'worker', self.greenhouse)
+            x, y = spawn_rng.uniform(2, width-2), spawn_rng.uniform(2, height-2)
+            drone = BeeDrone(x, y, drone_id, 'worker', self.greenhouse, self.trajectories,
+                             self.scheduler, self.hive, self.rng, self.np_rng)
             self.drones.append(drone)
             drone_id += 1
         
         # Abejas observadoras
         for _ in range(n_observers):
-            x, y = random.uniform(2, greenhouse_size-2), random.uniform(2, greenhouse_size-2)
-            drone = BeeDrone(x, y, drone_id, 'observer', self.greenhouse)
+            x, y = spawn_rng.uniform(2, width-2), spawn_rng.uniform(2, height-2)
+            drone = BeeDrone(x, y, drone_id, 'observer', self.greenhouse, self.trajectories,
+                             self.scheduler, self.hive, self.rng, self.np_rng)
             self.drones.append(drone)
             drone_id += 1
         
         # Abejas exploradoras
         for _ in range(n_scouts):
-            x, y = random.uniform(2, greenhouse_size-2), random.uniform(2, greenhouse_size-2)
-            drone = BeeDrone(x, y, drone_id, 'scout', self.greenhouse)
+            x, y = spawn_rng.uniform(2, width-2), spawn_rng.uniform(2, height-2)
+            drone = BeeDrone(x, y, drone_id, 'scout', self.greenhouse, self.trajectories,
+                             self.scheduler, self.hive, self.rng, self.np_rng)
             self.drones.append(drone)
             drone_id += 1
         
-        # Métricas
+        # Estado en arreglos para el motor por lotes
+        self.fleet = None
+        if engine == 'batched':
+            self.fleet = BeeFleet(self.drones, self.greenhouse, np.random.default_rng(seeds[0]))
+        
+        # Historial: 'full' (métricas e instantáneas cada history_stride iteraciones), 'metrics' o 'none'
+        self.history = ABCHistoryRecorder(
+            len(self.drones), len(self.greenhouse.flowers),
+            [DRONE_TYPES.index(drone.type) for drone in self.drones],
+            self.greenhouse.flower_positions, mode=history, stride=history_stride)
+        
+        # Métricas: totales incrementales (check_metrics los compara con un recálculo en cada lectura)
         self.coverage_history = []
-        self.pollination_history = []
-        self.energy_history = []
-        self.flower_visits_history = []
+        self.check_metrics = check_metrics
+        self.energy_total = float(sum(drone.battery for drone in self.drones))  # Motor por objetos
         
         self.record_state()
     
-    def run_iteration(self):
-        """Ejecutar una iteración de la simulación"""
+    @property
+    def pollination_history(self):
+        return self.history.avg_pollination[:self.history.n_records]
+    
+    @property
+    def energy_history(self):
+        return self.history.total_energy[:self.history.n_records]
+    
+    @property
+    def flower_visits_history(self):
+        return self.history.total_visits[:self.history.n_records]
+    
+    def run_iteration(self, timings=None):
+        """Ejecutar una iteración de la simulación (tiempos por fase en timings, si se pasa)"""
+        start = time.perf_counter()
+        
         # Actualizar flores
         self.greenhouse.update_flowers()
+        start = add_phase_time(timings, 'flowers', start)
         
-        # Actualizar todos los drones
-        for drone in self.drones:
-            drone.update()
+        # Actualizar todos los drones (el motor por objetos no separa las fases)
+        if self.fleet is not None:
+            self.fleet.step(timings)
+        else:
+            for drone in self.drones:
+                battery = drone.battery
+                drone.update()
+                self.energy_total += drone.battery - battery
+            add_phase_time(timings, 'drones', start)
         
         self.iteration += 1
+        if self.dance_interval and self.iteration % self.dance_interval == 0:
+            start = time.perf_counter()
+            self.waggle_dance()
+            add_phase_time(timings, 'decision', start)
+        self.hive.tick()
+        if self.scheduler is not None:
+            self.scheduler.tick()
+        start = time.perf_counter()
         self.record_state()
+        add_phase_time(timings, 'recording', start)
+    
+    def waggle_dance(self):
+        """Las recolectoras (obreras y exploradoras) comparten sus mejores flores con las observadoras"""
+        dancers = [drone.id for drone in self.drones if drone.type != 'observer']
+        followers = [drone.id for drone in self.drones if drone.type == 'observer']
+        new_followers, new_flowers = self.hive.waggle_dance(dancers, followers, self.dance_sites)
+        # Las flores recién aprendidas se añaden en orden a la lista de cada observadora
+        for drone_id, flower_id in zip(new_followers.tolist(), new_flowers.tolist()):
+            self.drones[drone_id].known_flowers.append(flower_id)
     
     def calculate_metrics(self):
-        """Calcular métricas de rendimiento"""
-        total_pollination = sum(flower['pollination_level'] for flower in self.greenhouse.flowers)
-        avg_pollination = total_pollination / len(self.greenhouse.flowers)
-        
-        total_energy = sum(drone.battery for drone in self.drones)
-        total_flowers_visited = sum(flower['visits'] for flower in self.greenhouse.flowers)
+        """Calcular métricas de rendimiento a partir de los totales incrementales"""
+        greenhouse = self.greenhouse
+        if self.check_metrics:
+            self.verify_metric_totals()
+        avg_pollination = greenhouse.pollination_total / max(1, len(greenhouse.flowers))
+        total_energy = self.fleet.battery_total if self.fleet is not None else self.energy_total
         
-        return avg_pollination, total_energy, total_flowers_visited
+        return avg_pollination, total_energy, greenhouse.visits_total
+    
+    def verify_metric_totals(self):
+        """Comprobar los totales incrementales contra un recálculo completo (depuración)"""
+        greenhouse = self.greenhouse
+        if self.fleet is not None:
+            energy, battery = self.fleet.battery_total, self.fleet.battery
+        else:
+            energy, battery = self.energy_total, [drone.battery for drone in self.drones]
+        checks = [
+            ('Total de polinización', greenhouse.pollination_total, greenhouse.flower_pollination.sum()),
+            ('Total de visitas', greenhouse.visits_total, greenhouse.flower_visits.sum()),
+            ('Conteo de flores sobre el 80%', greenhouse.well_pollinated,
+             np.count_nonzero(greenhouse.flower_pollination >= 80)),
+            ('Total de batería', energy, np.sum(battery))
+        ]
+        for name, total, recount in checks:
+            if not np.isclose(total, recount):
+                raise RuntimeError(f"{name} desincronizado en la iteración {self.iteration}: "
+                                   f"{total} (incremental) != {recount} (recálculo)")
+    
+    def snapshot_arrays(self):
+        """Estado actual como (posiciones, estados, batería, polinización, madurez)"""
+        greenhouse = self.greenhouse
+        if self.fleet is not None:
+            positions, battery, states = self.fleet.positions, self.fleet.battery, self.fleet.state
+        else:
+            positions = np.array([(drone.x, drone.y) for drone in self.drones])
+            states = np.array([DRONE_STATES.index(drone.state) for drone in self.drones], dtype=np.uint8)
+            battery = np.array([drone.battery for drone in self.drones])
+        return positions, states, battery, greenhouse.flower_pollination, greenhouse.flower_maturity
     
     def record_state(self):
         """Registrar estado actual para visualización"""
+        if self.history.mode == 'none':
+            return
         avg_pollination, total_energy, total_visits = self.calculate_metrics()
         
-        state = {
-            'drones': [{
-                'x': drone.x,
-                'y': drone.y,
-                'type': drone.type,
-                'state': drone.state,
-                'battery': drone.battery
-            } for drone in self.drones],
-            'flowers': [flower.copy() for flower in self.greenhouse.flowers],
-            'charging_stations': self.greenhouse.charging_stations,
-            'avg_pollination': avg_pollination,
-            'total_energy': total_energy,
-            'total_visits': total_visits
-        }
+        snapshot = None
+        if self.history.wants_snapshot(self.iteration):
+            snapshot = self.snapshot_arrays()
         
-        self.history.append(state)
-        self.pollination_history.append(avg_pollination)
-        self.energy_history.append(total_energy)
-        self.flower_visits_history.append(total_visits)
+        self.history.record(self.iteration, avg_pollination, total_energy, total_visits, snapshot)
+    
+    def iterate(self, max_iterations=None, snapshot_every=None):
+        """Generador que avanza la simulación y entrega las métricas de cada iteración
+        
+        Cada registro es un diccionario con 'iteration', 'avg_pollination',
+        'total_energy' y 'total_visits'; cada snapshot_every iteraciones incluye
+        además 'snapshot', una copia del estado de drones y flores. Sin
+        max_iterations no termina: el consumidor decide cuándo parar.
+        """
+        if max_iterations is not None:
+            self.history.reserve(self.iteration + 1, max_iterations)
+        count = 0
+        while max_iterations is None or count < max_iterations:
+            self.run_iteration()
+            count += 1
+            
+            avg_pollination, total_energy, total_visits = self.calculate_metrics()
+            record = {
+                'iteration': self.iteration,
+                'avg_pollination': float(avg_pollination),
+                'total_energy': float(total_energy),
+                'total_visits': total_visits
+            }
+            if snapshot_every and self.iteration % snapshot_every == 0:
+                positions, states, battery, pollination, maturity = self.snapshot_arrays()
+                record['snapshot'] = {
+                    'drone_positions': np.array(positions, dtype=np.float32),
+                    'drone_states': np.array(states, dtype=np.uint8),
+                    'drone_battery': np.array(battery, dtype=np.float32),
+                    'flower_pollination': np.array(pollination, dtype=np.float32),
+                    'flower_maturity': np.array(maturity, dtype=np.uint8)
+                }
+            yield record
     
     def run_simulation(self, max_iterations=300):
         """Ejecutar simulación completa"""
         start_time = time.time()
         
-        for i in range(max_iterations):
-            self.run_iteration()
-            
+        for i, record in enumerate(self.iterate(max_iterations)):
             # Mostrar progreso
             if i % 30 == 0:
-                avg_poll, energy, visits = self.calculate_metrics()
-                print(f"Iteración {i}: Polinización promedio: {avg_poll:.1f}%, "
-                      f"Energía total: {energy:.1f}, Visitas: {visits}")
+                print(f"Iteración {i}: Polinización promedio: {record['avg_pollination']:.1f}%, "
+                      f"Energía total: {record['total_energy']:.1f}, Visitas: {record['total_visits']}")
         
         # Métricas finales
         end_time = time.time()
+        if self.fleet is not None:
+            self.fleet.sync_drones()
         simulation_time = end_time - start_time
         
         avg_pollination, total_energy, total_visits = self.calculate_metrics()
-        total_pollinated = sum(1 for f in self.greenhouse.flowers if f['pollination_level'] >= 80)
+        total_pollinated = self.greenhouse.well_pollinated
         
         print("\n--- SIMULACIÓN COMPLETADA ---")
         print(f"Tiempo: {simulation_time:.2f}s, Iteraciones: {self.iteration}")
@@ -386,8 +1630,159 @@ class ABCDroneSwarm:
         
         return avg_pollination, total_energy, simulation_time
     
+    def save_checkpoint(self, path):
+        """Guardar el estado completo del enjambre (incluidos los generadores aleatorios) en un .npz
+        
+        Al cargarlo con load_checkpoint la simulación continúa exactamente igual
+        que si no se hubiera interrumpido.
+        """
+        greenhouse = self.greenhouse
+        if self.fleet is not None:
+            self.fleet.sync_drones()
+        drones = self.drones
+        
+        np_state = self.np_rng.get_state()
+        meta = {
+            'iteration': self.iteration,
+            'engine': self.engine,
+            'width': greenhouse.width,
+            'height': greenhouse.height,
+            'drone_types': [drone.type for drone in drones],
+            'drone_states': [drone.state for drone in drones],
+            'history': [self.history.mode, self.history.stride],
+            'trajectory': [self.trajectories.policy, self.trajectories.max_points],
+            'charging': 'nearest' if self.scheduler is None else 'scheduled',
+            'dance': [self.dance_interval, self.dance_sites],
+            'check_metrics': self.check_metrics,
+            # Totales incrementales tal cual (recalcularlos cambiaría el redondeo)
+            'totals': [greenhouse.pollination_total, greenhouse.visits_total, greenhouse.well_pollinated,
+                       self.fleet.battery_total if self.fleet is not None else self.energy_total],
+            'greenhouse_rng': greenhouse.rng.bit_generator.state,
+            'fleet_rng': None if self.fleet is None else self.fleet.rng.bit_generator.state,
+            # Generadores de las decisiones del motor por objetos (globales si no hay semilla)
+            'seeded': self.seeded,
+            'random_state': self.rng.getstate(),
+            'np_random_state': [np_state[0], int(np_state[2]), int(np_state[3]), float(np_state[4])]
+        }
+        
+        known = [np.asarray(drone.known_flowers, dtype=int) for drone in drones]
+        known_order = np.concatenate(known) if known else np.empty(0, dtype=int)
+        known_owner = np.repeat(np.arange(len(drones)), [len(ids) for ids in known])
+        last_positions = [drone.last_position if drone.last_position is not None else (np.nan, np.nan)
+                          for drone in drones]
+        arrays = {
+            'meta': np.array(json.dumps(meta)),
+            'np_random_keys': np_state[1],
+            # Invernadero
+            'station_positions': greenhouse.station_index.points,
+            'station_capacity': np.array([station['capacity'] for station in greenhouse.charging_stations]),
+            'flower_positions': greenhouse.flower_positions,
+            'flower_maturity': greenhouse.flower_maturity,
+            'flower_pollination': greenhouse.flower_pollination,
+            'flower_visits': greenhouse.flower_visits,
+            # Drones (flores conocidas en orden de descubrimiento, por drone; la calidad está en la colmena)
+            'drone_positions': np.array([(drone.x, drone.y) for drone in drones], dtype=float).reshape(-1, 2),
+            'drone_last_positions': np.array(last_positions, dtype=float).reshape(-1, 2),
+            'drone_battery': np.array([drone.battery for drone in drones], dtype=float),
+            'drone_targets': np.array([-1 if drone.target_flower is None else drone.target_flower['id']
+                                       for drone in drones], dtype=int),
+            'known_order': known_order,
+            'known_owner': known_owner,
+            'flowers_pollinated': np.array([drone.flowers_pollinated for drone in drones], dtype=int),
+            'total_pollination': np.array([drone.total_pollination for drone in drones], dtype=float),
+            'distance_traveled': np.array([drone.distance_traveled for drone in drones], dtype=float),
+            'charging_time': np.array([drone.charging_time for drone in drones], dtype=int)
+        }
+        parts = {'history': self.history, 'trajectory': self.trajectories, 'scheduler': self.scheduler,
+                 'hive': self.hive}
+        for prefix, part in parts.items():
+            if part is not None:
+                arrays.update({f'{prefix}.{name}': value for name, value in part.get_state().items()})
+        np.savez_compressed(path, **arrays)
+    
+    @classmethod
+    def load_checkpoint(cls, path, trajectory_path=None):
+        """Crear un enjambre a partir de un punto de control guardado con save_checkpoint
+        
+        También restaura los generadores de los que depende el motor por objetos:
+        los del enjambre si se creó con semilla o, si no, los estados globales de
+        random y np.random.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+        meta = json.loads(str(arrays['meta']))
+        drone_types = meta['drone_types']
+        stations = [{'pos': position, 'capacity': int(capacity)} for position, capacity in
+                    zip(arrays['station_positions'], arrays['station_capacity'])]
+        
+        swarm = cls(n_workers=drone_types.count('worker'), n_observers=drone_types.count('observer'),
+                    n_scouts=drone_types.count('scout'), greenhouse_size=(meta['width'], meta['height']),
+                    engine=meta['engine'], history=meta['history'][0], history_stride=meta['history'][1],
+                    trajectory=meta['trajectory'][0], trajectory_points=meta['trajectory'][1],
+                    trajectory_path=trajectory_path, charging=meta['charging'],
+                    n_flowers=len(arrays['flower_positions']), charging_stations=stations,
+                    dance_interval=meta['dance'][0], dance_sites=meta['dance'][1],
+                    check_metrics=meta['check_metrics'],
+                    # Con semilla el enjambre tiene generadores propios; su estado se restaura al final
+                    seed=0 if meta.get('seeded') else None)
+        swarm.iteration = meta['iteration']
+        
+        # Invernadero
+        greenhouse = swarm.greenhouse
+        greenhouse.flower_positions[:] = arrays['flower_positions']
+        greenhouse.flower_maturity[:] = arrays['flower_maturity']
+        greenhouse.flower_pollination[:] = arrays['flower_pollination']
+        greenhouse.flower_visits[:] = arrays['flower_visits']
+        greenhouse.pollination_total, greenhouse.visits_total, greenhouse.well_pollinated, energy = meta['totals']
+        swarm.energy_total = energy
+        greenhouse.flower_index = SpatialGrid(greenhouse.flower_positions, greenhouse.perception_radius,
+                                              greenhouse.width, greenhouse.height)
+        greenhouse.rng.bit_generator.state = meta['greenhouse_rng']
+        
+        # Drones
+        known_bounds = np.cumsum(np.bincount(arrays['known_owner'], minlength=len(swarm.drones)))[:-1]
+        known = np.split(arrays['known_order'], known_bounds)
+        for i, drone in enumerate(swarm.drones):
+            drone.x, drone.y = arrays['drone_positions'][i]
+            last_x, last_y = arrays['drone_last_positions'][i]
+            drone.last_position = None if np.isnan(last_x) else (last_x, last_y)
+            drone.battery = arrays['drone_battery'][i]
+            drone.state = meta['drone_states'][i]
+            target = arrays['drone_targets'][i]
+            drone.target_flower = greenhouse.flowers[target] if target >= 0 else None
+            drone.known_flowers = known[i].tolist()
+            drone.flowers_pollinated = int(arrays['flowers_pollinated'][i])
+            drone.total_pollination = arrays['total_pollination'][i]
+            drone.distance_traveled = arrays['distance_traveled'][i]
+            drone.charging_time = int(arrays['charging_time'][i])
+        
+        parts = {'history': swarm.history, 'trajectory': swarm.trajectories, 'scheduler': swarm.scheduler,
+                 'hive': swarm.hive}
+        for prefix, part in parts.items():
+            if part is not None:
+                part.set_state({name[len(prefix) + 1:]: value for name, value in arrays.items()
+                                if name.startswith(prefix + '.')})
+        
+        # El motor por lotes se reconstruye desde los drones restaurados
+        if swarm.fleet is not None:
+            swarm.fleet = BeeFleet(swarm.drones, greenhouse, np.random.default_rng())
+            swarm.fleet.rng.bit_generator.state = meta['fleet_rng']
+            swarm.fleet.battery_total = energy
+        
+        # Generadores de las decisiones, al final: sin semilla son los globales y construir
+        # el enjambre también los usa
+        version, internal, gauss = meta['random_state']
+        swarm.rng.setstate((version, tuple(internal), gauss))
+        name, pos, has_gauss, cached_gaussian = meta['np_random_state']
+        swarm.np_rng.set_state((name, arrays['np_random_keys'], pos, has_gauss, cached_gaussian))
+        return swarm
+    
     def visualize_simulation(self):
         """Visualizar la simulación"""
+        # Matplotlib se importa solo al visualizar (los módulos se pueden usar sin él)
+        import matplotlib.pyplot as plt
+        from matplotlib.animation import FuncAnimation
+        
         fig, ax = plt.subplots(figsize=(12, 10))
         
         # Colores por tipo de drone
@@ -397,39 +1792,38 @@ class ABCDroneSwarm:
             'scout': 'red'
         }
         
+        history = self.history
+        flower_x, flower_y = history.flower_positions[:, 0], history.flower_positions[:, 1]
+        type_colors = [drone_colors[drone_type] for drone_type in DRONE_TYPES]
+        base_colors = [type_colors[drone_type] for drone_type in history.drone_types]
+        
         def update(frame):
-            state = self.history[frame]
+            iteration = history.snapshot_iterations[frame]
             
             # Limpiar
             ax.clear()
             
             # Dibujar flores (color por nivel de polinización)
-            for flower in state['flowers']:
-                color_intensity = flower['pollination_level'] / 100
-                color = (0, color_intensity, 0)  # Verde más intenso = más polinizada
-                size = 30 + flower['maturity'] * 10  # Tamaño por madurez
-                
-                ax.scatter(flower['position'][0], flower['position'][1], 
-                          c=[color], s=size, alpha=0.7, edgecolors='darkgreen')
+            color_intensity = history.flower_pollination[frame] / 100
+            colors = np.column_stack([np.zeros_like(color_intensity), color_intensity,
+                                      np.zeros_like(color_intensity)])  # Verde más intenso = más polinizada
+            sizes = 30 + history.flower_maturity[frame].astype(float) * 10  # Tamaño por madurez
+            ax.scatter(flower_x, flower_y, c=colors, s=sizes, alpha=0.7, edgecolors='darkgreen')
             
             # Dibujar estaciones de carga
-            for station in state['charging_stations']:
+            for station in self.greenhouse.charging_stations:
                 ax.plot(station['pos'][0], station['pos'][1], 'ks', 
                        markersize=15, label='Estación de carga')
             
-            # Dibujar drones
-            for drone in state['drones']:
-                # Color base por tipo
-                base_color = drone_colors[drone['type']]
-                
-                # Tamaño por batería
-                size = 50 + drone['battery'] * 0.5
-                
-                ax.scatter(drone['x'], drone['y'], c=base_color, s=size, 
-                          edgecolors='black', linewidth=1, alpha=0.8)
-                
-                # Añadir etiqueta de estado
-                ax.text(drone['x'], drone['y'] + 0.3, drone['state'][0], 
+            # Dibujar drones (color por tipo, tamaño por batería)
+            positions = history.drone_positions[frame]
+            sizes = 50 + history.drone_battery[frame] * 0.5
+            ax.scatter(positions[:, 0], positions[:, 1], c=base_colors, s=sizes, 
+                      edgecolors='black', linewidth=1, alpha=0.8)
+            
+            # Añadir etiqueta de estado
+            for (x, y), state in zip(positions, history.drone_states[frame]):
+                ax.text(x, y + 0.3, DRONE_STATES[state][0], 
                        ha='center', va='center', fontsize=8, fontweight='bold')
             
             # Configuración del gráfico
@@ -437,7 +1831,7 @@ class ABCDroneSwarm:
             ax.set_ylim(0, self.greenhouse.height)
             ax.set_xlabel('Coordenada X')
             ax.set_ylabel('Coordenada Y')
-            ax.set_title(f'Polinización con Drones-Abejas - Iteración {frame}')
+            ax.set_title(f'Polinización con Drones-Abejas - Iteración {iteration}')
             ax.grid(True, alpha=0.3)
             
             # Leyenda
@@ -452,15 +1846,21 @@ class ABCDroneSwarm:
             ax.legend(handles=legend_elements, loc='upper right')
             
             # Información de estado
-            info_text = (f'Polinización promedio: {state["avg_pollination"]:.1f}%\n'
-                        f'Energía total: {state["total_energy"]:.1f}\n'
-                        f'Visitas totales: {state["total_visits"]}')
+            info_text = (f'Polinización promedio: {history.avg_pollination[iteration]:.1f}%\n'
+                        f'Energía total: {history.total_energy[iteration]:.1f}\n'
+                        f'Visitas totales: {history.total_visits[iteration]}')
             ax.text(0.02, 0.98, info_text, transform=ax.transAxes, verticalalignment='top',
                    bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.8))
             
             return ax,
         
-        ani = FuncAnimation(fig, update, frames=len(self.history), interval=200, repeat=False)
+        if len(history) == 0:
+            print("No hay instantáneas para animar (historial en modo 'metrics')")
+            plt.close(fig)
+            self.plot_metrics()
+            return
+        
+        ani = FuncAnimation(fig, update, frames=len(history), interval=200, repeat=False)
         
         # Guardar animación
         try:
@@ -477,6 +1877,8 @@ class ABCDroneSwarm:
     
     def plot_metrics(self):
         """Graficar métricas de la simulación"""
+        import matplotlib.pyplot as plt
+        
         fig, axes = plt.subplots(2, 2, figsize=(12, 10))
         
         # Polinización vs Iteraciones
@@ -501,6 +1903,8 @@ class ABCDroneSwarm:
         axes[1,0].grid(True)
         
         # Distribución de trabajo por tipo de drone
+        if self.fleet is not None:
+            self.fleet.sync_drones()
         worker_pollination = sum(d.flowers_pollinated for d in self.drones if d.type == 'worker')
         observer_pollination = sum(d.flowers_pollinated for d in self.drones if d.type == 'observer')
         scout_pollination = sum(d.flowers_pollinated for d in self.drones if d.type == 'scout')
@@ -1,34 +1,49 @@
 import numpy as np
-import matplotlib.pyplot as plt
 import random
-from matplotlib.animation import FuncAnimation
 import time
 
+# Desplazamientos (dx, dy) del vecindario de 8 celdas, en el orden de AntDrone.get_valid_neighbors
+NEIGHBOR_OFFSETS = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy])
+# Vecinos (dx, dy) de cada máscara de transitabilidad (bit k = NEIGHBOR_OFFSETS[k])
+NEIGHBOR_TABLE = [[tuple(offset) for k, offset in enumerate(NEIGHBOR_OFFSETS.tolist()) if mask >> k & 1]
+                  for mask in range(256)]
+
 class DisasterZone:
-    def __init__(self, width=30, height=30):
+    def __init__(self, width=30, height=30, rng=None):
         self.width = width
         self.height = height
-        self.grid = np.zeros((height, width))  # 0: terreno libre, 1: obstáculo, 2: superviviente, 3: recurso
-        self.pheromone_grid = np.zeros((height, width))  # Rastro de feromonas
-        self.visited_grid = np.zeros((height, width))  # Registro de celdas visitadas
+        self.rng = random if rng is None else rng  # random.Random propio o, sin él, el estado global
+        # Arreglos con un borde de una celda (obstáculo, sin feromonas ni visitas) para leer
+        # vecindarios sin comprobar límites; grid, pheromone_grid y visited_grid son vistas del interior
+        self.padded_grid = np.ones((height + 2, width + 2))
+        self.padded_pheromone = np.zeros((height + 2, width + 2))
+        self.padded_visited = np.zeros((height + 2, width + 2))
+        self.grid = self.padded_grid[1:-1, 1:-1]  # 0: terreno libre, 1: obstáculo, 2: superviviente, 3: recurso
+        self.grid[:] = 0
+        self.pheromone_grid = self.padded_pheromone[1:-1, 1:-1]  # Rastro de feromonas
+        self.visited_grid = self.padded_visited[1:-1, 1:-1]  # Registro de celdas visitadas
         self.survivors_found = 0
         self.total_survivors = 0
         self.initialize_zone()
         
+        # Grafo de transitabilidad: por celda, un bit por vecino dentro de la zona y sin obstáculo
+        self.neighbor_mask = np.zeros((height, width), dtype=np.uint8)
+        self.update_neighbor_mask(0, width - 1, 0, height - 1)
+        
     def initialize_zone(self):
         # Agregar obstáculos (escombros)
         for _ in range(40):
-            x, y = random.randint(0, self.width-1), random.randint(0, self.height-1)
-            size = random.randint(1, 3)
+            x, y = self.rng.randint(0, self.width-1), self.rng.randint(0, self.height-1)
+            size = self.rng.randint(1, 3)
             for i in range(max(0, x-size), min(self.width, x+size+1)):
                 for j in range(max(0, y-size), min(self.height, y+size+1)):
-                    if random.random() < 0.7:
+                    if self.rng.random() < 0.7:
                         self.grid[j, i] = 1
         
         # Agregar supervivientes
         for _ in range(15):
             while True:
-                x, y = random.randint(0, self.width-1), random.randint(0, self.height-1)
+                x, y = self.rng.randint(0, self.width-1), self.rng.randint(0, self.height-1)
                 if self.grid[y, x] == 0:  # Solo en terreno libre
                     self.grid[y, x] = 2
                     self.total_survivors += 1
@@ -37,21 +52,44 @@ class DisasterZone:
         # Agregar recursos
         for _ in range(10):
             while True:
-                x, y = random.randint(0, self.width-1), random.randint(0, self.height-1)
+                x, y = self.rng.randint(0, self.width-1), self.rng.randint(0, self.height-1)
                 if self.grid[y, x] == 0:  # Solo en terreno libre
                     self.grid[y, x] = 3
                     break
     
     def add_dynamic_obstacle(self):
         """Añadir un obstáculo dinámico (nuevos escombros)"""
-        x, y = random.randint(0, self.width-1), random.randint(0, self.height-1)
-        size = random.randint(2, 4)
+        x, y = self.rng.randint(0, self.width-1), self.rng.randint(0, self.height-1)
+        size = self.rng.randint(2, 4)
         for i in range(max(0, x-size), min(self.width, x+size+1)):
             for j in range(max(0, y-size), min(self.height, y+size+1)):
-                if random.random() < 0.6 and self.grid[j, i] == 0:
+                if self.rng.random() < 0.6 and self.grid[j, i] == 0:
                     self.grid[j, i] = 1
+        # Solo cambian las máscaras de las celdas vecinas a los escombros nuevos
+        self.update_neighbor_mask(x - size - 1, x + size + 1, y - size - 1, y + size + 1)
         return (x, y, size)
     
+    def update_neighbor_mask(self, x0, x1, y0, y1):
+        """Recalcular las máscaras de vecinos de las celdas x0..x1, y0..y1 (inclusive)"""
+        x0, x1 = max(0, x0), min(self.width - 1, x1)
+        y0, y1 = max(0, y0), min(self.height - 1, y1)
+        if x0 > x1 or y0 > y1:
+            return
+        # Con el borde, la celda (x, y) está en padded_grid[y + 1, x + 1]
+        passable = self.padded_grid[y0:y1 + 3, x0:x1 + 3] != 1
+        mask = np.zeros((y1 - y0 + 1, x1 - x0 + 1), dtype=np.uint8)
+        for k, (dx, dy) in enumerate(NEIGHBOR_OFFSETS):
+            mask |= passable[1 + dy:y1 - y0 + 2 + dy, 1 + dx:x1 - x0 + 2 + dx].astype(np.uint8) << k
+        self.neighbor_mask[y0:y1 + 1, x0:x1 + 1] = mask
+    
+    def valid_neighbors(self, x, y):
+        """Vecinos transitables de (x, y), consultando la máscara precalculada"""
+        return [(x + dx, y + dy) for dx, dy in NEIGHBOR_TABLE[self.neighbor_mask[y, x]]]
+    
+    def valid_neighbor_flags(self, xs, ys):
+        """Vecinos transitables de muchas celdas a la vez, como arreglo (n, 8) de booleanos"""
+        return (self.neighbor_mask[ys, xs, None] >> np.arange(len(NEIGHBOR_OFFSETS), dtype=np.uint8)) & 1 == 1
+    
     def evaporate_pheromones(self, evaporation_rate=0.1):
         """Evaporar feromonas con el tiempo"""
         self.pheromone_grid *= (1 - evaporation_rate)
@@ -78,11 +116,14 @@ class DisasterZone:
         return 0
 
 class AntDrone:
-    def __init__(self, x, y, drone_id, zone):
+    def __init__(self, x, y, drone_id, zone, rng=None, np_rng=None):
         self.x = x
         self.y = y
         self.id = drone_id
         self.zone = zone
+        # Generadores del movimiento (por defecto, los estados globales de random y np.random)
+        self.rng = random if rng is None else rng
+        self.np_rng = np.random if np_rng is None else np_rng
         self.path = [(x, y)]
         self.survivors_found = 0
         self.resources_found = 0
@@ -122,8 +163,8 @@ class AntDrone:
                 heuristic *= 3
             
             # Factor de exploración aleatoria
-            if random.random() < exploration_factor:
-                heuristic *= random.uniform(1, 3)
+            if self.rng.random() < exploration_factor:
+                heuristic *= self.rng.uniform(1, 3)
             
             # Calcular probabilidad
             probability = (pheromone ** alpha) * (heuristic ** beta)
@@ -138,7 +179,7 @@ class AntDrone:
             probabilities = [1 / len(neighbors)] * len(neighbors)
         
         # Seleccionar movimiento basado en probabilidades
-        next_index = np.random.choice(len(neighbors), p=probabilities)
+        next_index = self.np_rng.choice(len(neighbors), p=probabilities)
         next_x, next_y = neighbors[next_index]
         
         # Actualizar posición
@@ -207,22 +248,8 @@ class AntDrone:
         self.check_cell_content()
     
     def get_valid_neighbors(self):
-        """Obtener vecinos válidos para moverse"""
-        neighbors = []
-        for dx in [-1, 0, 1]:
-            for dy in [-1, 0, 1]:
-                # Excluir la posición actual
-                if dx == 0 and dy == 0:
-                    continue
-                
-                nx, ny = self.x + dx, self.y + dy
-                
-                # Verificar límites y obstáculos
-                if (0 <= nx < self.zone.width and 0 <= ny < self.zone.height and 
-                    self.zone.grid[ny, nx] != 1):  # No es un obstáculo
-                    neighbors.append((nx, ny))
-        
-        return neighbors
+        """Obtener vecinos válidos para moverse (dentro de la zona y sin obstáculo)"""
+        return self.zone.valid_neighbors(self.x, self.y)
     
     def check_cell_content(self):
         """Verificar el contenido de la celda actual"""
@@ -247,9 +274,171 @@ class AntDrone:
         self.has_target = True
         self.target_position = (x, y)
 
+class AntFleet:
+    """Estado de todos los AntDrone en arreglos para moverlos por lotes
+    
+    Cada drone elige su siguiente celda con el estado del inicio de la fase
+    (feromonas, visitas y terreno), leyendo su vecindario de 8 celdas de los
+    arreglos con borde de la zona. Después los efectos se aplican en este
+    orden: marcar las celdas visitadas, depositar feromonas (se suman si
+    varios drones llegan a la misma celda) y recoger supervivientes y
+    recursos, que en cada celda se queda el drone de menor ID.
+    """
+    def __init__(self, drones, zone, rng):
+        self.drones = drones
+        self.zone = zone
+        self.rng = rng
+        self.positions = np.array([(d.x, d.y) for d in drones], dtype=int).reshape(-1, 2)
+        self.has_target = np.array([d.has_target and d.target_position is not None for d in drones], dtype=bool)
+        self.targets = np.array([d.target_position if d.target_position else (-1, -1) for d in drones],
+                                dtype=int).reshape(-1, 2)
+        self.pheromone_strength = np.array([d.pheromone_strength for d in drones], dtype=float)
+        self.energy_consumed = np.array([d.energy_consumed for d in drones], dtype=int)
+        self.survivors_found = np.array([d.survivors_found for d in drones], dtype=int)
+        self.resources_found = np.array([d.resources_found for d in drones], dtype=int)
+        
+        # Recorridos: lo que ya tenían los drones y, por paso, (posiciones, quién añadió punto)
+        self.initial_paths = [list(d.path) for d in drones]
+        self.steps = []
+    
+    def step(self, alpha=1, beta=2, exploration_factor=0.1):
+        """Mover todos los drones un paso (con objetivo, hacia él; sin objetivo, con ACO)"""
+        new_positions = self.positions.copy()
+        moved = np.zeros(len(self.drones), dtype=bool)
+        
+        explorers = np.flatnonzero(~self.has_target)
+        next_cells, has_neighbors = self.choose_moves(explorers, alpha, beta, exploration_factor)
+        new_positions[explorers[has_neighbors]] = next_cells[has_neighbors]
+        moved[explorers[has_neighbors]] = True
+        
+        # Los drones con objetivo siempre cuentan el paso, aunque no puedan moverse
+        seekers = np.flatnonzero(self.has_target)
+        new_positions[seekers] = self.step_toward_targets(seekers)
+        moved[seekers] = True
+        
+        self.positions = new_positions
+        self.energy_consumed[moved] += 1
+        self.steps.append((new_positions, moved))
+        self.apply_effects(np.flatnonzero(moved))
+    
+    def choose_moves(self, ids, alpha, beta, exploration_factor):
+        """Siguiente celda de cada drone según feromonas y heurística, en un solo sorteo"""
+        zone = self.zone
+        nx = self.positions[ids, 0, None] + NEIGHBOR_OFFSETS[:, 0]
+        ny = self.positions[ids, 1, None] + NEIGHBOR_OFFSETS[:, 1]
+        
+        # Vecindario desde los arreglos con borde (+1 por el borde); transitables según la máscara
+        cells = zone.padded_grid[ny + 1, nx + 1]
+        valid = zone.valid_neighbor_flags(self.positions[ids, 0], self.positions[ids, 1])
+        pheromone = zone.padded_pheromone[ny + 1, nx + 1] + 0.1  # Evitar división por cero
+        heuristic = np.where(zone.padded_visited[ny + 1, nx + 1] == 0, 2.0, 1.0)
+        heuristic *= np.select([cells == 2, cells == 3], [5, 3], 1)
+        
+        # Factor de exploración aleatoria, por vecino
+        explore = self.rng.random(nx.shape) < exploration_factor
+        heuristic = np.where(explore, heuristic * self.rng.uniform(1, 3, nx.shape), heuristic)
+        weights = np.where(valid, (pheromone ** alpha) * (heuristic ** beta), 0)
+        
+        # Muestreo por la inversa de la distribución acumulada de cada fila
+        cumulative = np.cumsum(weights, axis=1)
+        draw = self.rng.random(len(ids)) * cumulative[:, -1]
+        # Si el redondeo lleva el sorteo al total, el conteo pasaría a los vecinos sin peso:
+        # se limita al último vecino con peso positivo de la fila
+        last = weights.shape[1] - 1 - np.argmax(weights[:, ::-1] > 0, axis=1)
+        choice = np.minimum((cumulative <= draw[:, None]).sum(axis=1), last)
+        rows = np.arange(len(ids))
+        next_cells = np.stack([nx[rows, choice], ny[rows, choice]], axis=1)
+        return next_cells, valid.any(axis=1)
+    
+    def step_toward_targets(self, ids):
+        """Paso hacia el objetivo por el eje dominante; si está bloqueado, el vecino más cercano"""
+        zone = self.zone
+        x, y = self.positions[ids, 0], self.positions[ids, 1]
+        tx, ty = self.targets[ids, 0], self.targets[ids, 1]
+        dx, dy = tx - x, ty - y
+        horizontal = np.abs(dx) > np.abs(dy)
+        next_x = np.where(horizontal, x + np.where(dx > 0, 1, -1), x)
+        next_y = np.where(horizontal, y, y + np.where(dy > 0, 1, -1))
+        result = np.stack([next_x, next_y], axis=1)
+        
+        # Movimiento directo bloqueado: vecino válido de menor distancia Manhattan (el primero si empatan)
+        blocked = zone.padded_grid[next_y + 1, next_x + 1] == 1
+        if blocked.any():
+            b = np.flatnonzero(blocked)
+            nx = x[b, None] + NEIGHBOR_OFFSETS[:, 0]
+            ny = y[b, None] + NEIGHBOR_OFFSETS[:, 1]
+            valid = zone.valid_neighbor_flags(x[b], y[b])
+            distance = np.where(valid, np.abs(nx - tx[b, None]) + np.abs(ny - ty[b, None]), np.inf)
+            best = np.argmin(distance, axis=1)
+            rows = np.arange(b.size)
+            stuck = ~valid.any(axis=1)
+            result[b, 0] = np.where(stuck, x[b], nx[rows, best])
+            result[b, 1] = np.where(stuck, y[b], ny[rows, best])
+        return result
+    
+    def apply_effects(self, ids):
+        """Marcar visitas, depositar feromonas y recoger el contenido de las celdas alcanzadas"""
+        zone = self.zone
+        x, y = self.positions[ids, 0], self.positions[ids, 1]
+        zone.visited_grid[y, x] = 1
+        np.add.at(zone.pheromone_grid, (y, x), self.pheromone_strength[ids])
+        
+        # Objetivos alcanzados
+        reached = self.has_target[ids] & (x == self.targets[ids, 0]) & (y == self.targets[ids, 1])
+        self.has_target[ids[reached]] = False
+        self.targets[ids[reached]] = -1
+        
+        # Cada celda con contenido la recoge el primer drone que llegó (ids está ordenado)
+        cells = zone.grid[y, x]
+        occupied = np.flatnonzero((cells == 2) | (cells == 3))
+        _, first = np.unique(y[occupied] * zone.width + x[occupied], return_index=True)
+        claims = np.sort(occupied[first])
+        for k in claims:
+            i = ids[k]
+            if cells[k] == 2:  # Superviviente
+                self.survivors_found[i] += 1
+                zone.survivors_found += 1
+                zone.deposit_pheromone(x[k], y[k], self.pheromone_strength[i] * 5)
+                print(f"¡Drone {i} encontró un superviviente! Total: {zone.survivors_found}/{zone.total_survivors}")
+            else:  # Recurso
+                self.resources_found[i] += 1
+                zone.deposit_pheromone(x[k], y[k], self.pheromone_strength[i] * 3)
+            zone.grid[y[k], x[k]] = 0
+    
+    def set_target(self, i, x, y):
+        """Establecer un objetivo específico para el drone i"""
+        self.has_target[i] = True
+        self.targets[i] = (x, y)
+    
+    def sync_drones(self):
+        """Copiar el estado de los arreglos a los objetos AntDrone"""
+        for i, drone in enumerate(self.drones):
+            drone.x, drone.y = (int(v) for v in self.positions[i])
+            drone.has_target = bool(self.has_target[i])
+            drone.target_position = tuple(int(v) for v in self.targets[i]) if self.has_target[i] else None
+            drone.energy_consumed = int(self.energy_consumed[i])
+            drone.survivors_found = int(self.survivors_found[i])
+            drone.resources_found = int(self.resources_found[i])
+            drone.path = self.initial_paths[i] + [tuple(int(v) for v in positions[i])
+                                                  for positions, moved in self.steps if moved[i]]
+
 class ACODroneSwarm:
-    def __init__(self, n_drones=10, zone_width=30, zone_height=30):
-        self.zone = DisasterZone(zone_width, zone_height)
+    def __init__(self, n_drones=10, zone_width=30, zone_height=30, engine='object', seed=None):
+        # Motor: 'object' (AntDrone.move uno por uno) o 'batched' (AntFleet, por lotes)
+        if engine not in ('object', 'batched'):
+            raise ValueError(f"Motor desconocido: {engine}")
+        self.engine = engine
+        
+        # Generadores: con seed, propios del enjambre y derivados de ella (zona, drones,
+        # objetivos y flota); sin seed, los estados globales de random y np.random
+        seeds = np.random.SeedSequence(seed).spawn(3)
+        if seed is None:
+            self.rng, np_rng = random, np.random
+        else:
+            self.rng = random.Random(int(seeds[1].generate_state(1)[0]))
+            np_rng = np.random.RandomState(np.random.MT19937(seeds[2]))
+        
+        self.zone = DisasterZone(zone_width, zone_height, self.rng)
         self.n_drones = n_drones
         self.drones = []
         self.iteration = 0
@@ -261,12 +450,17 @@ class ACODroneSwarm:
         # Inicializar drones en posiciones aleatorias
         for i in range(n_drones):
             while True:
-                x, y = random.randint(0, zone_width-1), random.randint(0, zone_height-1)
+                x, y = self.rng.randint(0, zone_width-1), self.rng.randint(0, zone_height-1)
                 if self.zone.grid[y, x] == 0:  # Posición libre
-                    drone = AntDrone(x, y, i, self.zone)
+                    drone = AntDrone(x, y, i, self.zone, self.rng, np_rng)
                     self.drones.append(drone)
                     break
         
+        # Estado en arreglos para el motor por lotes, con un generador propio
+        self.fleet = None
+        if engine == 'batched':
+            self.fleet = AntFleet(self.drones, self.zone, np.random.default_rng(seeds[0]))
+        
         # Registrar estado inicial
         self.record_state()
     
@@ -276,8 +470,11 @@ class ACODroneSwarm:
         self.zone.evaporate_pheromones()
         
         # Mover todos los drones
-        for drone in self.drones:
-            drone.move(alpha, beta, exploration_factor)
+        if self.fleet is not None:
+            self.fleet.step(alpha, beta, exploration_factor)
+        else:
+            for drone in self.drones:
+                drone.move(alpha, beta, exploration_factor)
         
         # Ocasionalmente agregar un obstáculo dinámico (cada 20 iteraciones)
         if self.iteration % 20 == 10 and self.iteration > 0:
@@ -298,22 +495,40 @@ class ACODroneSwarm:
         high_pheromone_cells = np.argwhere(self.zone.pheromone_grid >= high_pheromone_threshold)
         
         # Asignar estos objetivos a drones que no tienen objetivo
-        idle_drones = [drone for drone in self.drones if not drone.has_target]
+        if self.fleet is not None:
+            idle_drones = np.flatnonzero(~self.fleet.has_target)
+        else:
+            idle_drones = [drone for drone in self.drones if not drone.has_target]
         
         for drone in idle_drones[:min(len(high_pheromone_cells), len(idle_drones))]:
-            target_idx = random.randint(0, len(high_pheromone_cells) - 1)
+            target_idx = self.rng.randint(0, len(high_pheromone_cells) - 1)
             ty, tx = high_pheromone_cells[target_idx]
-            drone.set_target(tx, ty)
+            if self.fleet is not None:
+                self.fleet.set_target(drone, tx, ty)
+            else:
+                drone.set_target(tx, ty)
+    
+    def drone_positions(self):
+        """Posiciones (x, y) de todos los drones"""
+        if self.fleet is not None:
+            return [tuple(position) for position in self.fleet.positions.tolist()]
+        return [(drone.x, drone.y) for drone in self.drones]
+    
+    def total_energy(self):
+        """Energía total consumida por el enjambre"""
+        if self.fleet is not None:
+            return int(self.fleet.energy_consumed.sum())
+        return sum(drone.energy_consumed for drone in self.drones)
     
     def record_state(self):
         """Registrar el estado actual para visualización"""
         # Crear una copia del estado actual
         state = {
-            'drones': [(drone.x, drone.y) for drone in self.drones],
+            'drones': self.drone_positions(),
             'visited': self.zone.visited_grid.copy(),
             'grid': self.zone.grid.copy(),
             'coverage': self.zone.get_coverage_percentage(),
-            'total_energy': sum(drone.energy_consumed for drone in self.drones),
+            'total_energy': self.total_energy(),
             'survivors_found': self.zone.survivors_found
         }
         self.history.append(state)
@@ -332,7 +547,7 @@ class ACODroneSwarm:
             if i % 20 == 0:
                 coverage = self.zone.get_coverage_percentage()
                 survivors = self.zone.survivors_found
-                energy = sum(drone.energy_consumed for drone in self.drones)
+                energy = self.total_energy()
                 print(f"Iteración {i}: Cobertura {coverage:.1f}%, Supervivientes {survivors}/{self.zone.total_survivors}, Energía {energy}")
             
             # Detener si se encontraron todos los supervivientes
@@ -345,7 +560,9 @@ class ACODroneSwarm:
         
         # Métricas finales
         final_coverage = self.zone.get_coverage_percentage()
-        total_energy = sum(drone.energy_consumed for drone in self.drones)
+        total_energy = self.total_energy()
+        if self.fleet is not None:
+            self.fleet.sync_drones()
         
         print("\n--- SIMULACIÓN COMPLETADA ---")
         print(f"Tiempo de simulación: {simulation_time:.2f} segundos")
@@ -358,6 +575,10 @@ class ACODroneSwarm:
     
     def visualize_simulation(self):
         """Visualizar la simulación completa sin mapa de feromonas"""
+        # Matplotlib se importa solo al visualizar (los módulos se pueden usar sin él)
+        import matplotlib.pyplot as plt
+        from matplotlib.animation import FuncAnimation
+        
         fig, ax = plt.subplots(figsize=(10, 8))
         
         # Configurar colores para el terreno
@@ -420,6 +641,8 @@ class ACODroneSwarm:
     
     def plot_metrics(self):
         """Graficar métricas de la simulación"""
+        import matplotlib.pyplot as plt
+        
         fig, axes = plt.subplots(1, 3, figsize=(15, 5))
         
         # Cobertura vs Iteraciones
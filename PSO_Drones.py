@@ -1,25 +1,200 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
+import os
 import random
+import shutil
+import tempfile
+import weakref
+
+try:
+    from scipy.optimize import linear_sum_assignment
+    from scipy.spatial import cKDTree
+except ImportError:  # scipy es opcional: solo se usa con neighbor_search='kdtree' y assignment='optimal'
+    linear_sum_assignment = None
+    cKDTree = None
+
+def default_obstacles():
+    """Obstáculos a evitar en el espacio aéreo"""
+    return [
+        {'center': np.array([-2, 1]), 'radius': 1.2},
+        {'center': np.array([3, -2]), 'radius': 1.5},
+        {'center': np.array([0, -3]), 'radius': 1.0}
+    ]
+
+def obstacle_penalties(positions, obstacles):
+    """Penalización por obstáculos para un arreglo de posiciones (..., 2)"""
+    # reshape: sin obstáculos los centros son (0, 2) y la penalización es 0
+    centers = np.array([obstacle['center'] for obstacle in obstacles], dtype=float).reshape(-1, 2)
+    radii = np.array([obstacle['radius'] for obstacle in obstacles], dtype=float)
+    distance_to_obstacle = np.linalg.norm(positions[..., None, :] - centers, axis=-1)
+    with np.errstate(divide='ignore'):
+        near_penalty = np.maximum(0, 1 / (distance_to_obstacle - radii) - 1)
+    # Gran penalización dentro del obstáculo, decreciente si está cerca
+    return np.where(distance_to_obstacle < radii, 100, near_penalty).sum(axis=-1)
+
+def remove_files(paths):
+    """Borrar archivos temporales ignorando los que ya no existen"""
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+class TrajectoryHistory:
+    """Historial preasignado de posiciones (n_steps, n_drones, 2) y drones activos por paso
+    
+    mode: 'memory' (arreglo en RAM), 'memmap' (archivo mapeado en memoria) o
+    'none' (no se guarda nada, para ejecuciones que solo necesitan el resultado).
+    En modo memmap sin path, los archivos temporales que crea la clase se borran
+    con close() o al liberarse el historial.
+    
+    Si se llena (por ejemplo, al llamar otra vez a navigate() para continuar),
+    la capacidad se duplica y los pasos siguientes se añaden a continuación.
+    """
+    def __init__(self, n_steps, n_drones, mode='memory', path=None):
+        if mode not in ('memory', 'memmap', 'none'):
+            raise ValueError(f"Modo de historial desconocido: {mode}")
+        self.mode = mode
+        self.length = 0
+        self.path = None
+        self.cleanup = None
+        self.target_changes = []  # (primer paso, puntos objetivo por dron) cada vez que cambian
+        
+        if mode == 'memmap':
+            if path is None:
+                fd, path = tempfile.mkstemp(prefix='drones_history_', suffix='.dat')
+                os.close(fd)
+                self.cleanup = weakref.finalize(self, remove_files, [path, path + '.active'])
+            self.path = path
+            self.positions = np.memmap(path, dtype=np.float64, mode='w+',
+                                       shape=(n_steps, n_drones, 2))
+            self.active = np.memmap(path + '.active', dtype=bool, mode='w+',
+                                    shape=(n_steps, n_drones))
+        elif mode == 'memory':
+            self.positions = np.empty((n_steps, n_drones, 2))
+            self.active = np.empty((n_steps, n_drones), dtype=bool)
+        else:
+            self.positions = np.empty((0, n_drones, 2))
+            self.active = np.empty((0, n_drones), dtype=bool)
+    
+    def append(self, positions, active):
+        """Guardar las posiciones y la máscara de activos de un paso"""
+        if self.mode == 'none':
+            return
+        if self.length >= len(self.positions):
+            self.grow(max(1, 2 * len(self.positions)))
+        self.positions[self.length] = positions
+        self.active[self.length] = active
+        self.length += 1
+    
+    def grow(self, n_steps):
+        """Ampliar la capacidad a n_steps pasos conservando los ya guardados"""
+        shape = (n_steps,) + self.positions.shape[1:]
+        active_shape = (n_steps,) + self.active.shape[1:]
+        if self.mode == 'memmap':
+            # Alargar los archivos y volver a mapearlos
+            self.flush()
+            for path, size in ((self.path, np.prod(shape) * 8), (self.path + '.active', np.prod(active_shape))):
+                with open(path, 'r+b') as f:
+                    f.truncate(int(size))
+            self.positions = np.memmap(self.path, dtype=np.float64, mode='r+', shape=shape)
+            self.active = np.memmap(self.path + '.active', dtype=bool, mode='r+', shape=active_shape)
+        else:
+            positions = np.empty(shape)
+            active = np.empty(active_shape, dtype=bool)
+            positions[:self.length] = self.positions[:self.length]
+            active[:self.length] = self.active[:self.length]
+            self.positions, self.active = positions, active
+    
+    def record_targets(self, slot_targets):
+        """Registrar los puntos objetivo vigentes a partir del siguiente paso"""
+        if self.mode == 'none':
+            return
+        self.target_changes.append((self.length, np.array(slot_targets)))
+    
+    def frame_overlays(self):
+        """Precalcular en una pasada vectorizada los datos de cada frame
+        
+        Devuelve la máscara de activos (F, n), el índice del mejor dron activo por
+        frame (-1 si no hay) y, por frame, el índice del conjunto de puntos objetivo
+        vigente dentro de target_changes.
+        """
+        n_frames = self.length
+        active = np.asarray(self.active[:n_frames])
+        starts = np.array([step for step, _ in self.target_changes], dtype=int)
+        target_index = np.searchsorted(starts, np.arange(n_frames), side='right') - 1
+        
+        # Mejor dron: el activo más cercano a su punto objetivo en ese frame
+        best = np.full(n_frames, -1)
+        for k, (_, targets) in enumerate(self.target_changes):
+            frames = np.flatnonzero(target_index == k)
+            if frames.size == 0:
+                continue
+            distance = np.linalg.norm(self.positions[frames] - targets, axis=2)
+            distance[~active[frames]] = np.inf
+            best[frames] = np.where(active[frames].any(axis=1), np.argmin(distance, axis=1), -1)
+        return active, best, target_index
+    
+    def flush(self):
+        """Escribir a disco los pasos pendientes (solo en modo memmap)"""
+        if self.mode == 'memmap':
+            self.positions.flush()
+            self.active.flush()
+    
+    def close(self):
+        """Liberar los mapas y borrar los archivos temporales propios (si los hay)"""
+        if self.mode == 'memmap':
+            self.positions = np.empty((0,) + self.positions.shape[1:])
+            self.active = np.empty((0,) + self.active.shape[1:], dtype=bool)
+            self.length = 0
+        if self.cleanup is not None:
+            self.cleanup()
+    
+    def __len__(self):
+        return self.length
+    
+    def __getitem__(self, step):
+        return self.positions[:self.length][step]
 
 class AdvancedDroneFormationPSO:
-    def __init__(self, n_drones=15, max_iter=60, formation_type='dragon'):
+    def __init__(self, n_drones=15, max_iter=60, formation_type='dragon', engine='loop',
+                 neighbor_search='brute', assignment='sequential', history='memory',
+                 history_path=None, obstacles=None):
         # Configuración del espacio aéreo
         self.bounds = [-8, 8]
         self.n_drones = n_drones
         self.max_iter = max_iter
         self.formation_type = formation_type
         
-        # La formación objetivo (seleccionable)
-        self.target_formation = self.create_formation(formation_type, radius=3, center=[0, 0])
+        # Motor de actualización: 'loop' (dron por dron) o 'vectorized' (todo el enjambre a la vez)
+        if engine not in ('loop', 'vectorized'):
+            raise ValueError(f"Motor desconocido: {engine}")
+        self.engine = engine
+        
+        # Búsqueda de vecinos para la penalización por colisiones:
+        # 'brute' (todos contra todos), 'grid' (celdas uniformes) o 'kdtree' (scipy)
+        if neighbor_search not in ('brute', 'grid', 'kdtree'):
+            raise ValueError(f"Búsqueda de vecinos desconocida: {neighbor_search}")
+        if neighbor_search != 'brute' and engine != 'vectorized':
+            raise ValueError("La búsqueda de vecinos por índice espacial requiere engine='vectorized'")
+        if neighbor_search == 'kdtree' and cKDTree is None:
+            raise ImportError("neighbor_search='kdtree' requiere scipy")
+        self.neighbor_search = neighbor_search
+        self.safe_distance = 0.5  # Distancia mínima segura entre drones
+        
+        # Asignación de puntos de la formación: 'sequential' (k-ésimo dron activo al
+        # k-ésimo punto) u 'optimal' (mínima distancia total, algoritmo húngaro de scipy)
+        if assignment not in ('sequential', 'optimal'):
+            raise ValueError(f"Asignación desconocida: {assignment}")
+        if assignment == 'optimal' and linear_sum_assignment is None:
+            raise ImportError("assignment='optimal' requiere scipy")
+        self.assignment = assignment
+        
+        # La formación objetivo (seleccionable), con un punto por dron
+        self.target_formation = self.create_formation(formation_type, radius=3, center=[0, 0],
+                                                      n_points=n_drones)
         
         # Obstáculos a evitar
-        self.obstacles = [
-            {'center': np.array([-2, 1]), 'radius': 1.2},
-            {'center': np.array([3, -2]), 'radius': 1.5},
-            {'center': np.array([0, -3]), 'radius': 1.0}
-        ]
+        self.obstacles = default_obstacles() if obstacles is None else obstacles
         
         # Inicializar los drones en posiciones aleatorias
         self.drones = np.random.uniform(self.bounds[0], self.bounds[1], 
@@ -30,16 +205,31 @@ class AdvancedDroneFormationPSO:
         self.active_drones = [True] * self.n_drones
         self.failure_iteration = None
         
+        # Asignación dron -> punto objetivo, precalculada (solo cambia con los fallos)
+        self.assign_slots()
+        
+        # Contadores de la ejecución (evaluaciones de aptitud y criterio de parada)
+        self.evaluations = 0
+        self.iterations_run = 0
+        self.stop_reason = None
+        
         # Mejores posiciones personales y globales
         self.personal_best = self.drones.copy()
-        self.personal_best_fitness = np.array([self.fitness(p, i) for i, p in enumerate(self.drones)])
-        self.global_best = self.drones[np.argmin(self.personal_best_fitness)]
+        if self.engine == 'vectorized':
+            self.personal_best_fitness = self.fitness_batch()
+        else:
+            self.personal_best_fitness = np.array([self.fitness(p, i) for i, p in enumerate(self.drones)])
+        self.global_best = self.drones[np.argmin(self.personal_best_fitness)].copy()
         self.global_best_fitness = np.min(self.personal_best_fitness)
         
-        # Historial para la animación
-        self.history = [self.drones.copy()]
+        # Historial para la animación, preasignado para todas las iteraciones
+        self.history = TrajectoryHistory(self.max_iter + 1, self.n_drones, mode=history,
+                                         path=history_path)
+        self.history.record_targets(self.slot_targets)
+        self.history.append(self.drones, self.active_drones)
         
-    def create_formation(self, formation_type, radius, center, n_points=15):
+    @staticmethod
+    def create_formation(formation_type, radius, center, n_points=15):
         """Crear diferentes formaciones de drones"""
         angles = np.linspace(0, 2*np.pi, n_points, endpoint=False)
         formation = []
@@ -111,21 +301,38 @@ class AdvancedDroneFormationPSO:
                 self.target_formation = self.create_formation(
                     self.formation_type, radius=3, center=[0, 0], n_points=active_count
                 )
+                self.assign_slots()
+                self.history.record_targets(self.slot_targets)
+    
+    def assign_slots(self):
+        """Recalcular la asignación de puntos de la formación a los drones activos"""
+        targets = np.asarray(self.target_formation)
+        active_indices = np.flatnonzero(self.active_drones)
+        self.slot_assignment = np.full(self.n_drones, -1)  # -1: dron inactivo
+        
+        if self.assignment == 'optimal':
+            # Minimizar la distancia total entre posiciones actuales y puntos objetivo
+            cost = np.linalg.norm(self.drones[active_indices][:, None, :] - targets[None, :, :], axis=2)
+            rows, cols = linear_sum_assignment(cost)
+            slots = np.argmin(cost, axis=1)  # Sobrantes (más drones que puntos): punto más cercano
+            slots[rows] = cols
+        else:
+            slots = np.arange(active_indices.size)
+            slots[slots >= len(targets)] = 0  # Fallback
+        
+        self.slot_assignment[active_indices] = slots
+        self.slot_targets = np.zeros((self.n_drones, 2))
+        self.slot_targets[active_indices] = targets[slots]
     
     def fitness(self, position, drone_idx):
         """Función de aptitud mejorada: qué tan buena es una posición para un drone"""
         if not self.active_drones[drone_idx]:
             return float('inf')  # Penalización infinita para drones inactivos
+        self.evaluations += 1
             
         # 1. Distancia a la posición objetivo en la formación
-        # Si hay drones inactivos, redistribuir los objetivos entre los activos
-        active_indices = [i for i, active in enumerate(self.active_drones) if active]
-        target_idx = active_indices.index(drone_idx) if drone_idx in active_indices else 0
-        if target_idx < len(self.target_formation):
-            target_pos = self.target_formation[target_idx]
-        else:
-            target_pos = self.target_formation[0]  # Fallback
-            
+        # (la asignación se recalcula en assign_slots cuando fallan drones)
+        target_pos = self.slot_targets[drone_idx]
         distance_to_target = np.sqrt(np.sum((position - target_pos)**2))
         
         # 2. Penalización por acercarse a obstáculos
@@ -152,152 +359,527 @@ class AdvancedDroneFormationPSO:
         
         return distance_to_target + obstacle_penalty + collision_penalty + energy_penalty
     
-    def navigate(self):
-        """Los drones navegan para formar la figura con tolerancia a fallos"""
+    def fitness_batch(self):
+        """Aptitud de todos los drones a la vez (misma función que fitness, vectorizada)"""
+        active = np.asarray(self.active_drones)
+        fitness = np.full(self.n_drones, np.inf)  # Penalización infinita para drones inactivos
+        active_indices = np.flatnonzero(active)
+        if active_indices.size == 0:
+            return fitness
+        self.evaluations += active_indices.size
+        positions = self.drones[active_indices]
+        
+        # 1. Distancia a la posición objetivo asignada
+        distance_to_target = np.linalg.norm(positions - self.slot_targets[active_indices], axis=1)
+        
+        # 2. Penalización por obstáculos
+        obstacle_penalty = obstacle_penalties(positions, self.obstacles)
+        
+        # 3. Penalización por colisiones con otros drones activos
+        collision_penalty = self.collision_penalties(positions)
+        
+        # 4. Penalización por energía
+        energy_penalty = 0.1 * np.linalg.norm(self.velocities[active_indices], axis=1)
+        
+        fitness[active_indices] = distance_to_target + obstacle_penalty + collision_penalty + energy_penalty
+        return fitness
+    
+    def collision_penalties(self, positions):
+        """Penalización por colisiones de cada posición frente a las demás"""
+        n = len(positions)
+        if self.neighbor_search == 'brute':
+            distance = np.linalg.norm(positions[:, None, :] - positions[None, :, :], axis=2)
+            np.fill_diagonal(distance, np.inf)  # Un dron no colisiona consigo mismo
+            return (10 * np.maximum(0, self.safe_distance - distance)).sum(axis=1)
+        
+        # Con índice espacial solo se evalúan los pares dentro de la distancia segura
+        i, j, distance = self.neighbor_pairs(positions)
+        penalty = 10 * (self.safe_distance - distance)
+        return (np.bincount(i, weights=penalty, minlength=n) +
+                np.bincount(j, weights=penalty, minlength=n))
+    
+    def neighbor_pairs(self, positions):
+        """Pares (i, j) con i < j a menos de la distancia segura, en una sola pasada"""
+        r = self.safe_distance
+        if self.neighbor_search == 'kdtree':
+            pairs = cKDTree(positions).query_pairs(r, output_type='ndarray')
+            i, j = pairs[:, 0], pairs[:, 1]
+        else:
+            # Lista de celdas: cada dron solo se compara con las 9 celdas vecinas
+            cells = np.floor((positions - positions.min(axis=0)) / r).astype(np.int64)
+            n_rows = cells[:, 1].max() + 1
+            keys = cells[:, 0] * n_rows + cells[:, 1]
+            order = np.argsort(keys, kind='stable')
+            sorted_keys = keys[order]
+            
+            i_parts, j_parts = [], []
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    neighbor_y = cells[:, 1] + dy
+                    valid = (neighbor_y >= 0) & (neighbor_y < n_rows)
+                    neighbor_keys = (cells[:, 0] + dx) * n_rows + neighbor_y
+                    start = np.searchsorted(sorted_keys, neighbor_keys, side='left')
+                    end = np.searchsorted(sorted_keys, neighbor_keys, side='right')
+                    counts = np.where(valid, end - start, 0)
+                    total = counts.sum()
+                    if total == 0:
+                        continue
+                    # Expandir los rangos [start, end) de cada dron sin bucles de Python
+                    owner = np.repeat(np.arange(len(positions)), counts)
+                    within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                    i_parts.append(owner)
+                    j_parts.append(order[start[owner] + within])
+            if not i_parts:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+            i = np.concatenate(i_parts)
+            j = np.concatenate(j_parts)
+            keep = i < j
+            i, j = i[keep], j[keep]
+        
+        distance = np.linalg.norm(positions[i] - positions[j], axis=1)
+        close = distance < r
+        return i[close], j[close], distance[close]
+    
+    def update_swarm_loop(self):
+        """Una iteración de PSO actualizando dron por dron"""
+        for i in range(self.n_drones):
+            if not self.active_drones[i]:
+                continue  # Saltar drones inactivos
+                
+            # Factores aleatorios para la exploración
+            r1, r2 = np.random.rand(2)
+            
+            # Componentes de la velocidad:
+            inertia = 0.8 * self.velocities[i]
+            memory = 1.5 * r1 * (self.personal_best[i] - self.drones[i])
+            social = 1.5 * r2 * (self.global_best - self.drones[i])
+            
+            # Actualizar velocidad y posición
+            self.velocities[i] = inertia + memory + social
+            self.drones[i] += self.velocities[i]
+            
+            # Mantener a los drones dentro del espacio aéreo
+            self.drones[i] = np.clip(self.drones[i], self.bounds[0], self.bounds[1])
+            
+            # Evaluar la nueva posición
+            current_fitness = self.fitness(self.drones[i], i)
+            
+            # Actualizar mejores posiciones (minimizando)
+            if current_fitness < self.personal_best_fitness[i]:
+                self.personal_best[i] = self.drones[i]
+                self.personal_best_fitness[i] = current_fitness
+                
+                if current_fitness < self.global_best_fitness:
+                    self.global_best = self.drones[i]
+                    self.global_best_fitness = current_fitness
+    
+    def update_swarm_vectorized(self):
+        """Una iteración de PSO para todo el enjambre con operaciones de NumPy"""
+        active = np.asarray(self.active_drones)
+        
+        # Factores aleatorios para la exploración (uno por dron)
+        r1 = np.random.rand(self.n_drones, 1)
+        r2 = np.random.rand(self.n_drones, 1)
+        
+        # Componentes de la velocidad para todos los drones
+        inertia = 0.8 * self.velocities
+        memory = 1.5 * r1 * (self.personal_best - self.drones)
+        social = 1.5 * r2 * (self.global_best - self.drones)
+        
+        # Solo se mueven los drones activos
+        self.velocities[active] = (inertia + memory + social)[active]
+        self.drones[active] = np.clip(self.drones[active] + self.velocities[active],
+                                      self.bounds[0], self.bounds[1])
+        
+        # Evaluar todas las posiciones nuevas (los inactivos reciben inf y nunca mejoran)
+        current_fitness = self.fitness_batch()
+        improved = current_fitness < self.personal_best_fitness
+        self.personal_best[improved] = self.drones[improved]
+        self.personal_best_fitness[improved] = current_fitness[improved]
+        
+        best = np.argmin(current_fitness)
+        if current_fitness[best] < self.global_best_fitness:
+            self.global_best = self.drones[best].copy()
+            self.global_best_fitness = current_fitness[best]
+    
+    def formation_error(self):
+        """Máxima distancia de un dron activo a su punto objetivo"""
+        active = np.asarray(self.active_drones)
+        if not active.any():
+            return 0.0
+        return np.linalg.norm(self.drones[active] - self.slot_targets[active], axis=1).max()
+    
+    def check_convergence(self, fitness_history, tol, window, formation_tol, velocity_tol,
+                          max_evaluations):
+        """Devuelve el criterio de parada que se cumple, o None para seguir iterando"""
+        # Mejora de la aptitud global menor que tol en las últimas `window` iteraciones
+        if tol is not None and len(fitness_history) > window:
+            if fitness_history[-window - 1] - fitness_history[-1] <= tol:
+                return 'tolerance'
+        
+        # Todos los drones activos sobre su punto de la formación
+        if formation_tol is not None and self.formation_error() <= formation_tol:
+            return 'formation'
+        
+        # Colapso de la velocidad del enjambre
+        if velocity_tol is not None:
+            active = np.asarray(self.active_drones)
+            if np.linalg.norm(self.velocities[active], axis=1).max(initial=0) <= velocity_tol:
+                return 'velocity'
+        
+        # Presupuesto de evaluaciones de aptitud agotado
+        if max_evaluations is not None and self.evaluations >= max_evaluations:
+            return 'budget'
+        
+        return None
+    
+    def navigate(self, tol=None, window=10, formation_tol=None, velocity_tol=None,
+                 max_evaluations=None):
+        """Los drones navegan para formar la figura con tolerancia a fallos
+        
+        Los criterios de parada temprana están desactivados por defecto (None). Al
+        terminar, stop_reason indica cuál se cumplió ('max_iter' si ninguno).
+        """
+        self.stop_reason = 'max_iter'
+        fitness_history = [self.global_best_fitness]
+        
         for iteration in range(self.max_iter):
             # Simular fallo de un dron en la mitad de las iteraciones
             self.simulate_failure(iteration)
             
-            for i in range(self.n_drones):
-                if not self.active_drones[i]:
-                    continue  # Saltar drones inactivos
-                    
-                # Factores aleatorios para la exploración
-                r1, r2 = np.random.rand(2)
-                
-                # Componentes de la velocidad:
-                inertia = 0.8 * self.velocities[i]
-                memory = 1.5 * r1 * (self.personal_best[i] - self.drones[i])
-                social = 1.5 * r2 * (self.global_best - self.drones[i])
-                
-                # Actualizar velocidad y posición
-                self.velocities[i] = inertia + memory + social
-                self.drones[i] += self.velocities[i]
-                
-                # Mantener a los drones dentro del espacio aéreo
-                self.drones[i] = np.clip(self.drones[i], self.bounds[0], self.bounds[1])
-                
-                # Evaluar la nueva posición
-                current_fitness = self.fitness(self.drones[i], i)
-                
-                # Actualizar mejores posiciones (minimizando)
-                if current_fitness < self.personal_best_fitness[i]:
-                    self.personal_best[i] = self.drones[i]
-                    self.personal_best_fitness[i] = current_fitness
-                    
-                    if current_fitness < self.global_best_fitness:
-                        self.global_best = self.drones[i]
-                        self.global_best_fitness = current_fitness
+            if self.engine == 'vectorized':
+                self.update_swarm_vectorized()
+            else:
+                self.update_swarm_loop()
+            self.iterations_run = iteration + 1
             
             # Guardar posición para la animación
-            self.history.append(self.drones.copy())
+            self.history.append(self.drones, self.active_drones)
             
             if (iteration + 1) % 10 == 0:
                 active_count = sum(self.active_drones)
                 print(f"Iteración {iteration+1}: Mejor aptitud = {self.global_best_fitness:.3f}, Drones activos: {active_count}/{self.n_drones}")
+            
+            fitness_history.append(self.global_best_fitness)
+            reason = self.check_convergence(fitness_history, tol, window, formation_tol,
+                                            velocity_tol, max_evaluations)
+            if reason is not None:
+                self.stop_reason = reason
+                print(f"Parada temprana en la iteración {iteration+1} (criterio: {reason}, "
+                      f"evaluaciones: {self.evaluations})")
+                break
         
+        self.history.flush()
         return self.global_best, self.global_best_fitness
     
-    def visualize_navigation(self):
-        """Visualizar la navegación de los drones"""
-        fig, ax = plt.subplots(figsize=(10, 8))
+    def export_animation(self, filename=None, frames_dir=None, workers=None, chunk_size=None, fps=5):
+        """Renderizar el historial por bloques de frames en paralelo y unirlos
         
-        # Dibujar los obstáculos
-        for obstacle in self.obstacles:
-            circle = plt.Circle(obstacle['center'], obstacle['radius'], 
-                               color='red', alpha=0.3, label='Obstáculos' if obstacle is self.obstacles[0] else "")
-            ax.add_patch(circle)
-        
-        # Dibujar la formación objetivo
-        target_x = [pos[0] for pos in self.target_formation]
-        target_y = [pos[1] for pos in self.target_formation]
-        ax.plot(target_x, target_y, 'go', markersize=8, label='Formación objetivo')
-        
-        # Inicializar los drones
-        drones_plot = ax.scatter([], [], c='blue', edgecolors='black', 
-                                s=50, label='Drones activos')
-        inactive_drones_plot = ax.scatter([], [], c='gray', edgecolors='black', 
-                                         s=50, label='Drones inactivos')
-        best_drone_plot = ax.scatter([], [], c='red', edgecolors='black', 
-                                    s=100, label='Mejor posición')
-        
-        ax.set_xlim(self.bounds)
-        ax.set_ylim(self.bounds)
-        ax.set_xlabel('Coordenada X')
-        ax.set_ylabel('Coordenada Y')
-        ax.set_title(f'Navegación de Drones en Formación {self.formation_type.capitalize()} con PSO')
-        ax.legend()
-        ax.grid(True)
+        Los bloques se dibujan en un pool de procesos (workers=None usa todos los
+        núcleos, workers=1 dibuja en el proceso actual). Se guarda un GIF en
+        `filename` y/o una secuencia de imágenes PNG en `frames_dir`.
         
-        def update(frame):
-            drones = self.history[frame]
-            active_drones_pos = []
-            inactive_drones_pos = []
-            
-            for i, drone in enumerate(drones):
-                if i < len(self.active_drones) and self.active_drones[i]:
-                    active_drones_pos.append(drone)
-                else:
-                    inactive_drones_pos.append(drone)
-            
-            # Actualizar drones activos
-            if active_drones_pos:
-                drones_plot.set_offsets(active_drones_pos)
-            else:
-                drones_plot.set_offsets([])
-                
-            # Actualizar drones inactivos
-            if inactive_drones_pos:
-                inactive_drones_plot.set_offsets(inactive_drones_pos)
-            else:
-                inactive_drones_plot.set_offsets([])
-            
-            # Encontrar el drone activo con mejor aptitud en este frame
-            best_pos = None
-            best_fitness = float('inf')
-            for i, drone in enumerate(drones):
-                if i < len(self.active_drones) and self.active_drones[i]:
-                    # Para evitar cálculos costosos, usamos una aproximación simple
-                    # En una implementación real, podríamos precalcular esto
-                    target_idx = [j for j, active in enumerate(self.active_drones) if active].index(i)
-                    if target_idx < len(self.target_formation):
-                        target_pos = self.target_formation[target_idx]
-                        fitness_val = np.sqrt(np.sum((drone - target_pos)**2))
-                        if fitness_val < best_fitness:
-                            best_fitness = fitness_val
-                            best_pos = drone
-            
-            if best_pos is not None:
-                best_drone_plot.set_offsets([best_pos])
+        Cada proceso escribe sus frames como PNG en `frames_dir` (o en un directorio
+        temporal que se borra al terminar) y el GIF se arma leyéndolos de disco uno a
+        uno y en orden, sin reunir todos los frames RGB en la memoria del proceso actual.
+        """
+        if filename is None and frames_dir is None:
+            filename = f'drones_{self.formation_type}_animation.gif'
+        n_frames = len(self.history)
+        if n_frames == 0:
+            print("No hay historial para exportar (history='none')")
+            return
+        
+        active, best, target_index = self.history.frame_overlays()
+        targets = [targets for _, targets in self.history.target_changes]
+        
+        workers = workers or os.cpu_count() or 1
+        chunk_size = chunk_size or max(1, -(-n_frames // workers))
+        output_dir = frames_dir if frames_dir is not None else tempfile.mkdtemp(prefix='drones_frames_')
+        os.makedirs(output_dir, exist_ok=True)
+        jobs = []
+        for start in range(0, n_frames, chunk_size):
+            end = min(start + chunk_size, n_frames)
+            jobs.append({
+                'first_frame': start,
+                'positions': np.array(self.history[start:end]),
+                'active': active[start:end],
+                'best': best[start:end],
+                'targets': [targets[k] for k in target_index[start:end]],
+                'bounds': self.bounds,
+                'obstacles': self.obstacles,
+                'formation_type': self.formation_type,
+                'frames_dir': output_dir
+            })
+        
+        try:
+            if workers == 1 or len(jobs) == 1:
+                chunks = [render_navigation_frames(job) for job in jobs]
             else:
-                best_drone_plot.set_offsets([])
+                from concurrent.futures import ProcessPoolExecutor
+                with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+                    chunks = list(pool.map(render_navigation_frames, jobs))
             
-            return drones_plot, inactive_drones_plot, best_drone_plot
+            if frames_dir is not None:
+                print(f"Secuencia de {n_frames} imágenes guardada en '{frames_dir}'")
+            if filename is not None:
+                images = load_frame_files(path for chunk in chunks for path in chunk)
+                first = next(images)
+                first.save(filename, save_all=True, append_images=images,
+                           duration=int(1000 / fps), loop=0)
+                print(f"Animación guardada como '{filename}'")
+        finally:
+            if frames_dir is None:
+                shutil.rmtree(output_dir, ignore_errors=True)
+    
+    def visualize_navigation(self, workers=None):
+        """Visualizar la navegación de los drones"""
+        # Matplotlib se importa solo al visualizar (los módulos se pueden usar sin él)
+        import matplotlib.pyplot as plt
+        from matplotlib.animation import FuncAnimation
         
-        ani = FuncAnimation(fig, update, frames=len(self.history), 
-                           interval=200, blit=True, repeat=False)
+        if len(self.history) == 0:
+            print("No hay historial para visualizar (history='none')")
+            return
         
-        # Guardar la animación como archivo GIF
+        # Guardar la animación como archivo GIF (renderizado en paralelo)
         try:
-            filename = f'drones_{self.formation_type}_animation.gif'
-            ani.save(filename, writer='pillow', fps=5)
-            print(f"Animación guardada como '{filename}'")
+            self.export_animation(workers=workers)
         except Exception as e:
             print(f"No se pudo guardar la animación: {e}")
         
+        # Datos de cada frame precalculados (activos/inactivos, mejor dron, objetivos)
+        active, best, target_index = self.history.frame_overlays()
+        targets = [targets for _, targets in self.history.target_changes]
+        
+        fig, ax = plt.subplots(figsize=(10, 8))
+        plots = setup_navigation_axes(ax, self.bounds, self.obstacles, self.formation_type)
+        
+        def update(frame):
+            return draw_navigation_frame(plots, self.history[frame], active[frame], best[frame],
+                                         targets[target_index[frame]])
+        
+        ani = FuncAnimation(fig, update, frames=len(self.history), 
+                           interval=200, blit=True, repeat=False)
+        
         # Mostrar la animación
         plt.show()
 
-# Ejecutar la navegación de drones para las tres formaciones
-formations = ['dragon', 'robot', 'star']
+def setup_navigation_axes(ax, bounds, obstacles, formation_type):
+    """Dibujar la parte fija de la figura y crear los elementos que cambian por frame"""
+    import matplotlib.patches as patches
+    
+    # Dibujar los obstáculos
+    for obstacle in obstacles:
+        circle = patches.Circle(obstacle['center'], obstacle['radius'], 
+                                color='red', alpha=0.3, label='Obstáculos' if obstacle is obstacles[0] else "")
+        ax.add_patch(circle)
+    
+    # Formación objetivo y drones
+    targets_plot, = ax.plot([], [], 'go', markersize=8, label='Formación objetivo')
+    drones_plot = ax.scatter([], [], c='blue', edgecolors='black', 
+                            s=50, label='Drones activos')
+    inactive_drones_plot = ax.scatter([], [], c='gray', edgecolors='black', 
+                                     s=50, label='Drones inactivos')
+    best_drone_plot = ax.scatter([], [], c='red', edgecolors='black', 
+                                s=100, label='Mejor posición')
+    
+    ax.set_xlim(bounds)
+    ax.set_ylim(bounds)
+    ax.set_xlabel('Coordenada X')
+    ax.set_ylabel('Coordenada Y')
+    ax.set_title(f'Navegación de Drones en Formación {formation_type.capitalize()} con PSO')
+    ax.legend()
+    ax.grid(True)
+    return targets_plot, drones_plot, inactive_drones_plot, best_drone_plot
+
+def draw_navigation_frame(plots, drones, active, best, targets):
+    """Actualizar los elementos de la figura con los datos de un frame"""
+    targets_plot, drones_plot, inactive_drones_plot, best_drone_plot = plots
+    targets_plot.set_data(targets[active, 0], targets[active, 1])
+    drones_plot.set_offsets(drones[active])
+    inactive_drones_plot.set_offsets(drones[~active])
+    best_drone_plot.set_offsets(drones[best:best + 1] if best >= 0 else np.empty((0, 2)))
+    return targets_plot, drones_plot, inactive_drones_plot, best_drone_plot
+
+def render_navigation_frames(job):
+    """Renderizar un bloque de frames a PNG en frames_dir y devolver sus rutas (se ejecuta en un proceso del pool)"""
+    # Figure + FigureCanvasAgg no dependen de pyplot ni de un backend interactivo
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    
+    fig = Figure(figsize=(10, 8))
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    plots = setup_navigation_axes(ax, job['bounds'], job['obstacles'], job['formation_type'])
+    
+    paths = []
+    for offset, drones in enumerate(job['positions']):
+        draw_navigation_frame(plots, drones, job['active'][offset], job['best'][offset],
+                              job['targets'][offset])
+        path = os.path.join(job['frames_dir'], f"frame_{job['first_frame'] + offset:05d}.png")
+        canvas.print_png(path)
+        paths.append(path)
+    return paths
 
-for formation in formations:
-    print(f"\n=== Ejecutando formación {formation} ===")
-    drone_formation = AdvancedDroneFormationPSO(n_drones=15, max_iter=40, formation_type=formation)
-    best_position, best_fitness = drone_formation.navigate()
+def load_frame_files(paths):
+    """Leer de disco, uno a uno, los frames PNG para el escritor del GIF"""
+    from PIL import Image
+    
+    for path in paths:
+        with Image.open(path) as image:
+            image.load()
+            yield image.convert('RGB')
+
+class MultiSwarmDroneFormationPSO:
+    """K enjambres independientes de la misma formación avanzando en un solo paso vectorizado"""
+    def __init__(self, n_swarms=8, n_drones=15, max_iter=60, formation_type='dragon',
+                 assignment='sequential'):
+        self.bounds = [-8, 8]
+        self.n_swarms = n_swarms
+        self.n_drones = n_drones
+        self.max_iter = max_iter
+        self.formation_type = formation_type
+        self.safe_distance = 0.5
+        
+        if assignment not in ('sequential', 'optimal'):
+            raise ValueError(f"Asignación desconocida: {assignment}")
+        if assignment == 'optimal' and linear_sum_assignment is None:
+            raise ImportError("assignment='optimal' requiere scipy")
+        self.assignment = assignment
+        
+        self.obstacles = default_obstacles()
+        
+        # Estado de todos los enjambres como tensores (K, n_drones, 2)
+        self.drones = np.random.uniform(self.bounds[0], self.bounds[1],
+                                        (n_swarms, n_drones, 2))
+        self.velocities = np.zeros((n_swarms, n_drones, 2))
+        
+        # Tolerancia a fallos por enjambre
+        self.active_drones = np.ones((n_swarms, n_drones), dtype=bool)
+        self.failure_iteration = np.full(n_swarms, -1)  # -1: el enjambre no ha tenido fallos
+        
+        # Puntos objetivo asignados a cada dron de cada enjambre
+        self.slot_targets = np.zeros((n_swarms, n_drones, 2))
+        for k in range(n_swarms):
+            self.assign_slots(k)
+        
+        # Mejores posiciones personales y una mejor posición global por enjambre
+        self.personal_best = self.drones.copy()
+        self.personal_best_fitness = self.fitness_batch()
+        best = np.argmin(self.personal_best_fitness, axis=1)
+        swarms = np.arange(n_swarms)
+        self.global_best = self.drones[swarms, best].copy()
+        self.global_best_fitness = self.personal_best_fitness[swarms, best]
+    
+    def assign_slots(self, k):
+        """Recalcular la asignación de puntos objetivo del enjambre k"""
+        active_indices = np.flatnonzero(self.active_drones[k])
+        targets = np.asarray(AdvancedDroneFormationPSO.create_formation(
+            self.formation_type, radius=3, center=[0, 0], n_points=active_indices.size
+        ))
+        
+        if self.assignment == 'optimal':
+            cost = np.linalg.norm(self.drones[k, active_indices][:, None, :] - targets[None, :, :], axis=2)
+            _, slots = linear_sum_assignment(cost)
+        else:
+            slots = np.arange(active_indices.size)
+        
+        self.slot_targets[k] = 0
+        self.slot_targets[k, active_indices] = targets[slots]
+    
+    def simulate_failure(self, iteration):
+        """Simular el fallo de un dron en cada enjambre (cada uno elige el suyo)"""
+        if iteration != self.max_iter // 2:
+            return
+        for k in range(self.n_swarms):
+            if self.failure_iteration[k] >= 0:
+                continue
+            best_drone = np.argmin(self.personal_best_fitness[k])
+            candidates = [i for i in np.flatnonzero(self.active_drones[k]) if i != best_drone]
+            if candidates:
+                failed_drone = random.choice(candidates)
+                self.active_drones[k, failed_drone] = False
+                self.failure_iteration[k] = iteration
+                self.assign_slots(k)
     
-    print(f"¡Mejor posición encontrada: {best_position}")
-    print(f"Aptitud de la mejor posición: {best_fitness:.3f}")
+    def fitness_batch(self):
+        """Aptitud de todos los drones de todos los enjambres (inf para los inactivos)"""
+        active = self.active_drones
+        
+        # 1. Distancia a la posición objetivo asignada
+        distance_to_target = np.linalg.norm(self.drones - self.slot_targets, axis=2)
+        
+        # 2. Penalización por obstáculos
+        obstacle_penalty = obstacle_penalties(self.drones, self.obstacles)
+        
+        # 3. Penalización por colisiones dentro de cada enjambre (solo entre drones activos)
+        distance = np.linalg.norm(self.drones[:, :, None, :] - self.drones[:, None, :, :], axis=3)
+        pair_active = active[:, :, None] & active[:, None, :]
+        pair_active[:, np.arange(self.n_drones), np.arange(self.n_drones)] = False
+        collision = np.where(pair_active, 10 * np.maximum(0, self.safe_distance - distance), 0)
+        collision_penalty = collision.sum(axis=2)
+        
+        # 4. Penalización por energía
+        energy_penalty = 0.1 * np.linalg.norm(self.velocities, axis=2)
+        
+        fitness = distance_to_target + obstacle_penalty + collision_penalty + energy_penalty
+        return np.where(active, fitness, np.inf)
     
-    # Mostrar la animación
-    drone_formation.visualize_navigation()
\ No newline at end of file
+    def update_swarms(self):
+        """Una iteración de PSO para los K enjambres a la vez"""
+        active = self.active_drones
+        r1 = np.random.rand(self.n_swarms, self.n_drones, 1)
+        r2 = np.random.rand(self.n_swarms, self.n_drones, 1)
+        
+        inertia = 0.8 * self.velocities
+        memory = 1.5 * r1 * (self.personal_best - self.drones)
+        social = 1.5 * r2 * (self.global_best[:, None, :] - self.drones)
+        
+        self.velocities[active] = (inertia + memory + social)[active]
+        self.drones[active] = np.clip(self.drones[active] + self.velocities[active],
+                                      self.bounds[0], self.bounds[1])
+        
+        current_fitness = self.fitness_batch()
+        improved = current_fitness < self.personal_best_fitness
+        self.personal_best[improved] = self.drones[improved]
+        self.personal_best_fitness[improved] = current_fitness[improved]
+        
+        # Mejor global independiente para cada enjambre
+        swarms = np.arange(self.n_swarms)
+        best = np.argmin(current_fitness, axis=1)
+        best_fitness = current_fitness[swarms, best]
+        improved_global = best_fitness < self.global_best_fitness
+        self.global_best[improved_global] = self.drones[swarms, best][improved_global]
+        self.global_best_fitness[improved_global] = best_fitness[improved_global]
+    
+    def navigate(self):
+        """Los K enjambres navegan hacia la formación con tolerancia a fallos"""
+        for iteration in range(self.max_iter):
+            self.simulate_failure(iteration)
+            self.update_swarms()
+            
+            if (iteration + 1) % 10 == 0:
+                print(f"Iteración {iteration+1}: Mejor aptitud = {self.global_best_fitness.min():.3f} "
+                      f"(enjambre {self.best_swarm()} de {self.n_swarms})")
+        
+        return self.global_best, self.global_best_fitness
+    
+    def best_swarm(self):
+        """Índice del enjambre con la mejor aptitud global"""
+        return int(np.argmin(self.global_best_fitness))
+
+# Ejecutar la navegación de drones para las tres formaciones
+if __name__ == "__main__":
+    formations = ['dragon', 'robot', 'star']
+    
+    for formation in formations:
+        print(f"\n=== Ejecutando formación {formation} ===")
+        drone_formation = AdvancedDroneFormationPSO(n_drones=15, max_iter=40, formation_type=formation)
+        best_position, best_fitness = drone_formation.navigate()
+        
+        print(f"¡Mejor posición encontrada: {best_position}")
+        print(f"Aptitud de la mejor posición: {best_fitness:.3f}")
+        
+        # Mostrar la animación
+        drone_formation.visualize_navigation()
\ No newline at end of file
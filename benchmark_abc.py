@@ -0,0 +1,148 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import numpy as np
+from ABC import ABCDroneSwarm, Greenhouse
+
+PHASES = ['flowers', 'perception', 'decision', 'movement', 'drones', 'recording']
+
+def build_swarm(n_drones, n_flowers, engine, density, station_spacing, history_stride, seed=0):
+    """Crear un enjambre a escala: lado del invernadero según la densidad de flores"""
+    random.seed(seed)
+    np.random.seed(seed)
+    side = max(10.0, float(np.sqrt(n_flowers / density)))
+    n_side = max(1, int(round(side / station_spacing)))
+    stations = Greenhouse.grid_stations(side, side, n_side, n_side)
+
+    # Mismas proporciones de tipos que el enjambre por defecto (8:4:3)
+    n_observers = n_drones * 4 // 15
+    n_scouts = n_drones * 3 // 15
+    n_workers = n_drones - n_observers - n_scouts
+    return ABCDroneSwarm(n_workers=n_workers, n_observers=n_observers, n_scouts=n_scouts,
+                         greenhouse_size=side, seed=seed, engine=engine, history_stride=history_stride,
+                         n_flowers=n_flowers, charging_stations=stations)
+
+def benchmark_case(n_drones, n_flowers, engine, args):
+    """Medir iteraciones por segundo, tiempo por fase y memoria máxima de una configuración"""
+    start = time.perf_counter()
+    swarm = build_swarm(n_drones, n_flowers, engine, args.density, args.station_spacing, args.history_stride)
+    setup_time = time.perf_counter() - start
+    for _ in range(args.warmup):
+        swarm.run_iteration()
+
+    timings = {}
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        swarm.run_iteration(timings)
+    elapsed = time.perf_counter() - start
+
+    # Memoria máxima de una ejecución equivalente (sin medir tiempos, tracemalloc la ralentiza)
+    peak_memory = None
+    if not args.skip_memory:
+        tracemalloc.start()
+        swarm = build_swarm(n_drones, n_flowers, engine, args.density, args.station_spacing,
+                            args.history_stride)
+        for _ in range(args.warmup + args.iterations):
+            swarm.run_iteration()
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        'n_drones': n_drones,
+        'n_flowers': n_flowers,
+        'engine': engine,
+        'greenhouse_side': swarm.greenhouse.width,
+        'n_stations': len(swarm.greenhouse.charging_stations),
+        'setup_s': setup_time,
+        'ticks_per_s': args.iterations / elapsed,
+        'phase_s_per_tick': {phase: timings[phase] / args.iterations for phase in PHASES if phase in timings},
+        'peak_memory_bytes': peak_memory
+    }
+
+def case_key(result):
+    """Identificador de una configuración para comparar con la línea base"""
+    return (result['engine'], result['n_drones'], result['n_flowers'])
+
+def compare_with_baseline(results, baseline, threshold):
+    """Comparar iteraciones por segundo contra la línea base; devuelve las regresiones"""
+    baseline_by_key = {case_key(result): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        reference = baseline_by_key.get(case_key(result))
+        if reference is None:
+            continue
+        ratio = reference['ticks_per_s'] / result['ticks_per_s']
+        result['baseline_ratio'] = ratio
+        if ratio > threshold:
+            regressions.append(result)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de escalado para ABC (sin pantalla)')
+    parser.add_argument('--flowers', type=int, nargs='+', default=[100, 1000, 10000, 100000],
+                        help='Cantidades de flores a barrer (con --base-drones drones)')
+    parser.add_argument('--drones', type=int, nargs='+', default=[10, 100, 1000, 10000],
+                        help='Cantidades de drones a barrer (con --base-flowers flores)')
+    parser.add_argument('--base-drones', type=int, default=15)
+    parser.add_argument('--base-flowers', type=int, default=1000)
+    parser.add_argument('--engines', nargs='+', default=['batched'], choices=['object', 'batched'])
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--density', type=float, default=50 / 400, help='Flores por unidad de superficie')
+    parser.add_argument('--station-spacing', type=float, default=10,
+                        help='Distancia entre estaciones de carga (rejilla regular)')
+    parser.add_argument('--history-stride', type=int, default=10)
+    parser.add_argument('--skip-memory', action='store_true', help='No medir la memoria máxima')
+    parser.add_argument('--output', default='abc_benchmark.json', help='Archivo JSON de resultados')
+    parser.add_argument('--baseline', default=None, help='JSON de una ejecución anterior para comparar')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='Razón de tiempo por iteración considerada regresión')
+    args = parser.parse_args(argv)
+
+    # Dos barridos: flores con drones fijos y drones con flores fijas
+    cases = [(args.base_drones, n_flowers) for n_flowers in args.flowers]
+    cases += [(n_drones, args.base_flowers) for n_drones in args.drones
+              if (n_drones, args.base_flowers) not in cases]
+
+    results = []
+    for engine in args.engines:
+        for n_drones, n_flowers in cases:
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = benchmark_case(n_drones, n_flowers, engine, args)
+            results.append(result)
+            phases = ' '.join(f"{phase}={seconds * 1000:.2f}ms"
+                              for phase, seconds in result['phase_s_per_tick'].items())
+            memory = ('' if result['peak_memory_bytes'] is None
+                      else f" memoria={result['peak_memory_bytes'] / 2**20:8.1f} MiB")
+            print(f"{engine:8s} drones={n_drones:6d} flores={n_flowers:7d} "
+                  f"iteraciones/s={result['ticks_per_s']:9.1f} {phases}{memory}")
+
+    regressions = []
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+        for result in regressions:
+            print(f"Regresión: {case_key(result)} es {result['baseline_ratio']:.2f}x más lento que la línea base")
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'iterations': args.iterations,
+            'results': results
+        }, f, indent=2)
+    print(f"Resultados guardados en '{args.output}'")
+
+    return 1 if regressions else 0
+
+# Ejecutar los benchmarks
+if __name__ == "__main__":
+    sys.exit(main())
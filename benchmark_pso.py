@@ -0,0 +1,146 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import numpy as np
+from PSO_Drones import AdvancedDroneFormationPSO
+
+FORMATIONS = ['circle', 'dragon', 'robot', 'star']
+
+def random_obstacles(n_obstacles, bounds=(-8, 8)):
+    """Generar obstáculos circulares aleatorios dentro del espacio aéreo"""
+    return [
+        {'center': np.random.uniform(bounds[0] + 2, bounds[1] - 2, 2),
+         'radius': np.random.uniform(0.5, 1.5)}
+        for _ in range(n_obstacles)
+    ]
+
+def benchmark_case(n_drones, n_obstacles, formation, engine, iterations, repeats):
+    """Medir create_formation, fitness y navigate para una configuración"""
+    np.random.seed(0)
+    random.seed(0)
+    obstacles = random_obstacles(n_obstacles)
+
+    # create_formation
+    start = time.perf_counter()
+    for _ in range(repeats):
+        AdvancedDroneFormationPSO.create_formation(formation, radius=3, center=[0, 0], n_points=n_drones)
+    formation_time = (time.perf_counter() - start) / repeats
+
+    pso = AdvancedDroneFormationPSO(n_drones=n_drones, max_iter=iterations, formation_type=formation,
+                                    engine=engine, history='none', obstacles=obstacles)
+
+    # Evaluaciones de aptitud (todo el enjambre una vez por repetición)
+    evaluations = pso.evaluations
+    start = time.perf_counter()
+    for _ in range(repeats):
+        if engine == 'vectorized':
+            pso.fitness_batch()
+        else:
+            for i, position in enumerate(pso.drones):
+                pso.fitness(position, i)
+    fitness_time = time.perf_counter() - start
+    fitness_evaluations = pso.evaluations - evaluations
+
+    # navigate (tiempo medido sin tracemalloc, que ralentiza la ejecución)
+    evaluations = pso.evaluations
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        pso.navigate()
+    navigate_time = time.perf_counter() - start
+
+    # Memoria máxima de una ejecución equivalente, incluyendo la construcción
+    np.random.seed(0)
+    random.seed(0)
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        AdvancedDroneFormationPSO(n_drones=n_drones, max_iter=iterations, formation_type=formation,
+                                  engine=engine, history='none', obstacles=obstacles).navigate()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'n_drones': n_drones,
+        'n_obstacles': n_obstacles,
+        'formation': formation,
+        'engine': engine,
+        'create_formation_s': formation_time,
+        'fitness_evals_per_s': fitness_evaluations / fitness_time,
+        'time_per_iteration_s': navigate_time / pso.iterations_run,
+        'navigate_evals_per_s': (pso.evaluations - evaluations) / navigate_time,
+        'peak_memory_bytes': peak_memory
+    }
+
+def case_key(result):
+    """Identificador de una configuración para comparar con la línea base"""
+    return (result['engine'], result['formation'], result['n_drones'], result['n_obstacles'])
+
+def compare_with_baseline(results, baseline, threshold):
+    """Comparar tiempos por iteración contra la línea base; devuelve las regresiones"""
+    baseline_by_key = {case_key(result): result for result in baseline['results']}
+    regressions = []
+    for result in results:
+        reference = baseline_by_key.get(case_key(result))
+        if reference is None:
+            continue
+        ratio = result['time_per_iteration_s'] / reference['time_per_iteration_s']
+        result['baseline_ratio'] = ratio
+        if ratio > threshold:
+            regressions.append(result)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Microbenchmarks de escalado para PSO_Drones (sin pantalla)')
+    parser.add_argument('--drones', type=int, nargs='+', default=[15, 50, 100, 200])
+    parser.add_argument('--obstacles', type=int, nargs='+', default=[3, 10, 30])
+    parser.add_argument('--formations', nargs='+', default=FORMATIONS, choices=FORMATIONS)
+    parser.add_argument('--engines', nargs='+', default=['loop', 'vectorized'], choices=['loop', 'vectorized'])
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', default='pso_benchmark.json', help='Archivo JSON de resultados')
+    parser.add_argument('--baseline', default=None, help='JSON de una ejecución anterior para comparar')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='Razón de tiempo por iteración considerada regresión')
+    args = parser.parse_args(argv)
+
+    results = []
+    for engine in args.engines:
+        for formation in args.formations:
+            for n_drones in args.drones:
+                for n_obstacles in args.obstacles:
+                    result = benchmark_case(n_drones, n_obstacles, formation, engine,
+                                            args.iterations, args.repeats)
+                    results.append(result)
+                    print(f"{engine:10s} {formation:7s} drones={n_drones:5d} obstáculos={n_obstacles:3d} "
+                          f"iteración={result['time_per_iteration_s'] * 1000:8.2f} ms "
+                          f"evals/s={result['fitness_evals_per_s']:10.0f} "
+                          f"memoria={result['peak_memory_bytes'] / 1024:8.1f} KiB")
+
+    regressions = []
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+        for result in regressions:
+            print(f"Regresión: {case_key(result)} es {result['baseline_ratio']:.2f}x más lento que la línea base")
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'iterations': args.iterations,
+            'results': results
+        }, f, indent=2)
+    print(f"Resultados guardados en '{args.output}'")
+
+    return 1 if regressions else 0
+
+# Ejecutar los benchmarks
+if __name__ == "__main__":
+    sys.exit(main())
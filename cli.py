@@ -0,0 +1,157 @@
+import argparse
+import random
+import numpy as np
+
+def run_pso(args):
+    """Ejecutar la formación de drones con PSO"""
+    from PSO_Drones import AdvancedDroneFormationPSO
+
+    for formation in args.formations:
+        print(f"\n=== Ejecutando formación {formation} ===")
+        drone_formation = AdvancedDroneFormationPSO(
+            n_drones=args.drones,
+            max_iter=args.iterations,
+            formation_type=formation,
+            engine=args.engine,
+            neighbor_search=args.neighbor_search,
+            assignment=args.assignment,
+            history=args.history
+        )
+        best_position, best_fitness = drone_formation.navigate(
+            tol=args.tol,
+            window=args.window,
+            formation_tol=args.formation_tol,
+            velocity_tol=args.velocity_tol,
+            max_evaluations=args.max_evaluations
+        )
+
+        print(f"¡Mejor posición encontrada: {best_position}")
+        print(f"Aptitud de la mejor posición: {best_fitness:.3f}")
+        print(f"Iteraciones: {drone_formation.iterations_run} (parada: {drone_formation.stop_reason})")
+
+        if not args.headless:
+            drone_formation.visualize_navigation()
+
+def run_aco(args):
+    """Ejecutar la búsqueda de supervivientes con ACO"""
+    from ACO import ACODroneSwarm
+
+    swarm = ACODroneSwarm(n_drones=args.drones, zone_width=args.size, zone_height=args.size,
+                          engine=args.engine, seed=args.seed)
+    swarm.run_simulation(
+        max_iterations=args.iterations,
+        alpha=args.alpha,
+        beta=args.beta,
+        exploration_factor=args.exploration
+    )
+
+    if not args.headless:
+        swarm.visualize_simulation()
+
+def run_abc(args):
+    """Ejecutar la polinización con ABC"""
+    from ABC import ABCDroneSwarm, Greenhouse
+
+    # Estaciones de carga: rejilla de --stations o las cuatro por defecto
+    if args.stations is not None:
+        n_cols, n_rows = args.stations
+        stations = Greenhouse.grid_stations(args.size, args.size, n_cols, n_rows,
+                                            capacity=args.station_capacity or 3)
+    else:
+        stations = Greenhouse.default_stations(args.size, args.size)
+        if args.station_capacity is not None:
+            for station in stations:
+                station['capacity'] = args.station_capacity
+
+    swarm = ABCDroneSwarm(
+        n_workers=args.workers,
+        n_observers=args.observers,
+        n_scouts=args.scouts,
+        greenhouse_size=args.size,
+        n_flowers=args.flowers,
+        charging_stations=stations,
+        seed=args.seed,
+        engine=args.engine,
+        charging=args.charging,
+        dance_interval=args.dance_interval,
+        dance_sites=args.dance_sites
+    )
+    swarm.run_simulation(args.iterations)
+
+    if not args.headless:
+        swarm.visualize_simulation()
+
+def build_parser():
+    """Construir el parser de la línea de comandos"""
+    parser = argparse.ArgumentParser(description='Simulaciones de enjambres de drones (PSO, ACO, ABC)')
+    subparsers = parser.add_subparsers(dest='algorithm', required=True)
+
+    # Opciones comunes a todas las simulaciones
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--headless', action='store_true',
+                        help='Solo calcular resultados, sin importar matplotlib ni generar animaciones')
+    common.add_argument('--seed', type=int, default=None, help='Semilla para random y numpy')
+
+    pso = subparsers.add_parser('pso', parents=[common], help='Formación de drones con PSO')
+    pso.add_argument('--drones', type=int, default=15)
+    pso.add_argument('--iterations', type=int, default=40)
+    pso.add_argument('--formations', nargs='+', default=['dragon', 'robot', 'star'],
+                     choices=['circle', 'dragon', 'robot', 'star'])
+    pso.add_argument('--engine', default='loop', choices=['loop', 'vectorized'])
+    pso.add_argument('--neighbor-search', default='brute', choices=['brute', 'grid', 'kdtree'])
+    pso.add_argument('--assignment', default='sequential', choices=['sequential', 'optimal'])
+    pso.add_argument('--history', default='memory', choices=['memory', 'memmap', 'none'],
+                     help='Dónde guardar las trayectorias para la animación')
+    pso.add_argument('--tol', type=float, default=None,
+                     help='Parar si la mejor aptitud mejora menos que esto en --window iteraciones')
+    pso.add_argument('--window', type=int, default=10, help='Ventana de iteraciones para --tol')
+    pso.add_argument('--formation-tol', type=float, default=None,
+                     help='Parar cuando el error de formación baje de este valor')
+    pso.add_argument('--velocity-tol', type=float, default=None,
+                     help='Parar cuando la velocidad máxima de los drones activos baje de este valor')
+    pso.add_argument('--max-evaluations', type=int, default=None,
+                     help='Parar al alcanzar este número de evaluaciones de aptitud')
+    pso.set_defaults(run=run_pso)
+
+    aco = subparsers.add_parser('aco', parents=[common], help='Búsqueda de supervivientes con ACO')
+    aco.add_argument('--drones', type=int, default=12)
+    aco.add_argument('--size', type=int, default=30)
+    aco.add_argument('--iterations', type=int, default=150)
+    aco.add_argument('--alpha', type=float, default=1, help='Peso de las feromonas')
+    aco.add_argument('--beta', type=float, default=2, help='Peso de la heurística')
+    aco.add_argument('--exploration', type=float, default=0.1, help='Factor de exploración aleatoria')
+    aco.add_argument('--engine', default='object', choices=['object', 'batched'])
+    aco.set_defaults(run=run_aco)
+
+    abc = subparsers.add_parser('abc', parents=[common], help='Polinización en invernadero con ABC')
+    abc.add_argument('--workers', type=int, default=8)
+    abc.add_argument('--observers', type=int, default=4)
+    abc.add_argument('--scouts', type=int, default=3)
+    abc.add_argument('--size', type=int, default=20)
+    abc.add_argument('--flowers', type=int, default=50, help='Número de flores del invernadero')
+    abc.add_argument('--stations', type=int, nargs=2, default=None, metavar=('COLS', 'ROWS'),
+                     help='Rejilla de estaciones de carga (por defecto, cuatro cerca de las esquinas)')
+    abc.add_argument('--station-capacity', type=int, default=None,
+                     help='Drones que carga a la vez cada estación (por defecto 3, o 3/2 en las de las esquinas)')
+    abc.add_argument('--iterations', type=int, default=200)
+    abc.add_argument('--engine', default='object', choices=['object', 'batched'])
+    abc.add_argument('--charging', default='nearest', choices=['nearest', 'scheduled'])
+    abc.add_argument('--dance-interval', type=int, default=0,
+                     help='Iteraciones entre danzas de las recolectoras (0 las desactiva)')
+    abc.add_argument('--dance-sites', type=int, default=5, help='Mejores sitios que comparte cada danza')
+    abc.set_defaults(run=run_abc)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.seed is not None:
+        random.seed(args.seed)
+        np.random.seed(args.seed)
+
+    args.run(args)
+
+# Punto de entrada de la línea de comandos
+if __name__ == "__main__":
+    main()
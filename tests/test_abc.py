@@ -0,0 +1,26 @@
+import random
+import numpy as np
+import pytest
+from ABC import ABCDroneSwarm
+
+@pytest.mark.parametrize('engine', ['object', 'batched'])
+def test_seed_reproduces_swarm_without_global_state(engine):
+    """Dos enjambres con la misma semilla dan las mismas métricas sin tocar random ni np.random"""
+    runs = []
+    for global_seed in (1, 2):
+        # Estados globales distintos en cada ejecución: no deben influir
+        random.seed(global_seed)
+        np.random.seed(global_seed)
+        random_state, np_state = random.getstate(), np.random.get_state()[1].copy()
+        swarm = ABCDroneSwarm(seed=5, engine=engine, charging='scheduled')
+        for _ in range(100):
+            swarm.run_iteration()
+        assert random.getstate() == random_state
+        assert np.array_equal(np.random.get_state()[1], np_state)
+        runs.append(swarm)
+    first, second = runs
+    assert np.array_equal(first.greenhouse.flower_positions, second.greenhouse.flower_positions)
+    assert [drone.x for drone in first.drones] == [drone.x for drone in second.drones]
+    assert np.array_equal(first.pollination_history, second.pollination_history)
+    assert np.array_equal(first.energy_history, second.energy_history)
+    assert np.array_equal(first.flower_visits_history, second.flower_visits_history)
@@ -0,0 +1,16 @@
+import numpy as np
+import pytest
+from PSO_Drones import AdvancedDroneFormationPSO
+
+@pytest.mark.parametrize('history', ['memory', 'memmap'])
+def test_navigate_twice_extends_history(history):
+    """Llamar otra vez a navigate() continúa el historial en lugar de fallar por falta de espacio"""
+    np.random.seed(0)
+    swarm = AdvancedDroneFormationPSO(n_drones=10, max_iter=10, history=history)
+    swarm.navigate()
+    first_run = np.array(swarm.history[:])
+    swarm.navigate()
+    assert len(swarm.history) == 2 * 10 + 1
+    assert np.array_equal(swarm.history[:len(first_run)], first_run)
+    assert np.array_equal(swarm.history[-1], swarm.drones)
+    swarm.history.close()